@@ -1,31 +1,136 @@
 from .utils.mongo import MongoConnection
+from mongo.parallel_scan import parallel_scan
 import asyncio
 from dotenv import load_dotenv
 import os
-import pandas as pd
+import re
+from bson import ObjectId
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 load_dotenv()
 
+PART_PATTERN = re.compile(r"^part-([0-9a-f]{24})-([0-9a-f]{24})\.parquet$")
+
+
+def export_schema(timestamp_field: str = None) -> pa.Schema:
+    fields = [
+        pa.field("id", pa.string()),
+        pa.field("latitude", pa.float64()),
+        pa.field("longitude", pa.float64()),
+    ]
+    if timestamp_field:
+        fields.append(pa.field(timestamp_field, pa.timestamp("ms", tz="UTC")))
+    return pa.schema(fields)
+
+
+def last_exported_id(out_dir: str):
+    """The checkpoint is the highest last _id among the finished part files."""
+    if not os.path.isdir(out_dir):
+        return None
+    last_ids = [m.group(2) for m in map(PART_PATTERN.match, os.listdir(out_dir)) if m]
+    return max(last_ids) if last_ids else None
+
+
+def export_disease_locations(collection, out_dir: str, batch_size: int = 10_000,
+                             rows_per_file: int = 1_000_000, timestamp_field: str = None,
+                             workers: int = 1) -> int:
+    """
+    Stream disease locations into a directory of Parquet part files.
+
+    Rows go straight from the cursor into Arrow record batches of batch_size
+    rows, so memory stays flat. Each part file is written under a hidden temp
+    name and renamed to part-<first_id>-<last_id>.parquet once complete; the
+    highest finished last_id is the checkpoint, so a rerun (or a rerun after a
+    network failure) only appends documents newer than it.
+
+    With workers > 1 the _id range is scanned concurrently (parallel_scan)
+    and merged back in _id order, so part files and checkpoints are unchanged.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    schema = export_schema(timestamp_field)
+
+    last_id = last_exported_id(out_dir)
+    query = {"_id": {"$gt": ObjectId(last_id)}} if last_id else {}
+    projection = {"diseaseLocation": 1, "_id": 1}
+    if timestamp_field:
+        projection[timestamp_field] = 1
+
+    if workers > 1:
+        cursor = parallel_scan(collection, query, projection, max_workers=workers,
+                               n_partitions=workers * 4, batch_size=batch_size)
+    else:
+        cursor = collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+    writer = None
+    tmp_path = None
+    first_id = file_last_id = None
+    file_rows = 0
+    total = 0
+    columns = {name: [] for name in schema.names}
+
+    def flush_batch():
+        nonlocal writer, tmp_path
+        if not columns["id"]:
+            return
+        if writer is None:
+            tmp_path = os.path.join(out_dir, f".part-{first_id}.parquet.tmp")
+            writer = pq.ParquetWriter(tmp_path, schema)
+        writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    def close_file():
+        nonlocal writer, tmp_path, first_id, file_rows
+        flush_batch()
+        if writer is None:
+            return
+        writer.close()
+        os.replace(tmp_path, os.path.join(out_dir, f"part-{first_id}-{file_last_id}.parquet"))
+        writer = tmp_path = first_id = None
+        file_rows = 0
+
+    try:
+        for doc in cursor:
+            doc_id = str(doc["_id"])
+            if first_id is None:
+                first_id = doc_id
+            file_last_id = doc_id
+
+            location = doc.get("diseaseLocation") or {}
+            columns["id"].append(doc_id)
+            columns["latitude"].append(location.get("latitude"))
+            columns["longitude"].append(location.get("longitude"))
+            if timestamp_field:
+                columns[timestamp_field].append(doc.get(timestamp_field))
+
+            file_rows += 1
+            total += 1
+            if len(columns["id"]) >= batch_size:
+                flush_batch()
+            if file_rows >= rows_per_file:
+                close_file()
+        close_file()
+    finally:
+        # An unfinished part file is never renamed, so it can't move the checkpoint
+        if writer is not None:
+            writer.close()
+            os.remove(tmp_path)
+
+    return total
+
+
 async def main():
     mongo = MongoConnection(collections=os.getenv("DISEASE_COLLECTION"))
     mongo.connect()
     _, collection = mongo.get_db()
-    
-    results = []
-    for doc in collection.find({}, {"diseaseLocation": 1, "_id": 1}):
-        results.append({
-            "id": str(doc["_id"]),  # convert ObjectId to string
-            "latitude": doc.get("diseaseLocation", {}).get("latitude"),
-            "longitude": doc.get("diseaseLocation", {}).get("longitude")
-        })
-
-    # Convert to DataFrame
-    df = pd.DataFrame(results)
 
-    # Export to Parquet
-    df.to_parquet("disease_locations.parquet", engine="pyarrow", index=False)
+    # Export to a Parquet dataset directory (read back with pd.read_parquet("disease_locations"))
+    out_dir = "disease_locations"
+    # Parallel range scans are opt-in (EXPORT_WORKERS > 1)
+    exported = export_disease_locations(collection, out_dir, workers=int(os.getenv("EXPORT_WORKERS", "1")))
 
-    print("Exported to disease_locations.parquet")
+    print(f"Exported {exported} new documents to {out_dir}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import time
+
+from proximity_index import DiseaseProximityIndex, EARTH_RADIUS_KM, distance_score_vectorized
+
+# (score, upper distance bound in km) — same bands as distance_score_vectorized
+SCORE_BANDS = [(100, 1), (80, 10), (60, 20), (40, 50)]
+
+
+def score_points(index: DiseaseProximityIndex, lats, lons, k: int = 10, chunk_size: int = 2_000):
+    """
+    Score M query points against the disease index in one pass.
+    Returns (summary, nearest):
+      summary — one row per query point with band_{score} counts and max_score
+      nearest — long format, k rows per query point (query_idx, rank, id, distance_km, score)
+    Band counts and nearest scores both come from BallTree distances banded by
+    distance_score_vectorized, so they agree on points at a band edge.
+    Work is done chunk by chunk through the BallTree, so memory is bounded by
+    a chunk's k nearest and its neighbours within the outer band, not M * N.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.shape != lons.shape:
+        raise ValueError("lats and lons must have the same shape")
+
+    m = len(lats)
+    k = min(k, len(index))
+    ids = index.df["id"].to_numpy() if "id" in index.df.columns else np.arange(len(index))
+
+    band_counts = {score: np.zeros(m, dtype=np.int64) for score, _ in SCORE_BANDS}
+    max_radius_km = max(radius_km for _, radius_km in SCORE_BANDS)
+    max_score = np.zeros(m, dtype=int)
+    nearest_frames = []
+
+    for start in range(0, m, chunk_size):
+        stop = min(start + chunk_size, m)
+        points = np.radians(np.column_stack([lats[start:stop], lons[start:stop]]))
+
+        # Band counts from the same distances and distance_score_vectorized bands
+        # (d < bound) as the nearest scores, so an edge point is counted where it is scored
+        neigh_idx, neigh_dist = index.tree.query_radius(points, r=max_radius_km / EARTH_RADIUS_KM,
+                                                        return_distance=True)
+        sizes = np.array([len(a) for a in neigh_idx], dtype=np.int64)
+        if sizes.sum():
+            row = np.repeat(np.arange(stop - start), sizes)
+            neigh_scores = distance_score_vectorized(np.concatenate(neigh_dist) * EARTH_RADIUS_KM)
+            for score, _ in SCORE_BANDS:
+                band_counts[score][start:stop] = np.bincount(row[neigh_scores == score], minlength=stop - start)
+
+        if k == 0:
+            continue
+
+        dist, idx = index.tree.query(points, k=k, return_distance=True, sort_results=True)
+        dist_km = dist * EARTH_RADIUS_KM
+        scores = distance_score_vectorized(dist_km)
+        # Nearest record always carries the highest score
+        max_score[start:stop] = scores[:, 0]
+
+        nearest_frames.append(pd.DataFrame({
+            "query_idx": np.repeat(np.arange(start, stop), k),
+            "rank": np.tile(np.arange(k), stop - start),
+            "id": ids[idx.ravel()],
+            "distance_km": dist_km.ravel(),
+            "score": scores.ravel(),
+        }))
+
+    summary = pd.DataFrame({"latitude": lats, "longitude": lons})
+    for score, _ in SCORE_BANDS:
+        summary[f"band_{score}"] = band_counts[score]
+    summary["max_score"] = max_score
+
+    if nearest_frames:
+        nearest = pd.concat(nearest_frames, ignore_index=True)
+    else:
+        nearest = pd.DataFrame(columns=["query_idx", "rank", "id", "distance_km", "score"])
+    return summary, nearest
+
+
+def main():
+    start = time.time()
+
+    disease_path = r"E:\Hydroneo\Analytics\disease\data\cleaned_data_removed_ZERO.parquet"
+    ponds_path = r"E:\Hydroneo\Analytics\disease\data\pond_locations.parquet"
+    summary_path = r"E:\Hydroneo\Analytics\disease\data\pond_disease_scores.parquet"
+    nearest_path = r"E:\Hydroneo\Analytics\disease\data\pond_disease_nearest.parquet"
+
+    # Build the index once over every disease record
+    df = pd.read_parquet(disease_path, engine="pyarrow")
+    index = DiseaseProximityIndex(df)
+
+    # Every pond location to score
+    ponds = pd.read_parquet(ponds_path, engine="pyarrow")
+    summary, nearest = score_points(
+        index, ponds["latitude"].to_numpy(), ponds["longitude"].to_numpy(), k=10
+    )
+    if "id" in ponds.columns:
+        summary.insert(0, "pond_id", ponds["id"].to_numpy())
+
+    summary.to_parquet(summary_path, index=False)
+    nearest.to_parquet(nearest_path, index=False)
+    print(f"✅ Scored {len(summary)} ponds → {summary_path}")
+    print(summary.sort_values(by="max_score", ascending=False).head(10))
+
+    end = time.time()
+    print(f"Time taken: {end - start:.4f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import onnxruntime as ort
+
+MANIFEST_NAME = "manifest.json"
+BUILDS_DIR = "builds"
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_data(data_path: str) -> pd.DataFrame:
+    if data_path.endswith(".csv"):
+        return pd.read_csv(data_path)
+    return pd.read_parquet(data_path, engine="pyarrow")
+
+
+def predict_onnx_clusters(session, coords: np.ndarray) -> np.ndarray:
+    input_name = session.get_inputs()[0].name
+    output_name = session.get_outputs()[0].name
+    return session.run([output_name], {input_name: coords.astype(np.float32)})[0]
+
+
+def partition_path(build_dir: str, cluster_col: str, cluster_id: int) -> str:
+    return os.path.join(build_dir, f"{cluster_col}={int(cluster_id)}.parquet")
+
+
+def load_manifest(out_dir: str):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_partitions(data_path: str, model_path: str, out_dir: str, cluster_col: str = "cluster") -> dict:
+    """
+    Label every row with the ONNX model once and write one Parquet file per cluster,
+    plus a manifest holding the model hash and the cluster centroids.
+
+    Each build writes into its own out_dir/builds/<id> directory and the
+    manifest is switched to it atomically at the end, so readers always see
+    either the previous complete build or the new one. The build the old
+    manifest pointed to is kept until the next switch, so a reader that loaded
+    that manifest just before this one can still open its files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    df = read_data(data_path)
+    session = ort.InferenceSession(model_path)
+    df[cluster_col] = predict_onnx_clusters(session, df[['latitude', 'longitude']].to_numpy())
+
+    build = os.path.join(BUILDS_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}")
+    build_dir = os.path.join(out_dir, build)
+    os.makedirs(build_dir)
+
+    clusters = {}
+    for cluster_id, group in df.groupby(cluster_col):
+        path = partition_path(build_dir, cluster_col, cluster_id)
+        group.to_parquet(path, index=False)
+        clusters[str(int(cluster_id))] = {
+            "file": os.path.relpath(path, out_dir),
+            "rows": len(group),
+            "centroid": [float(group['latitude'].mean()), float(group['longitude'].mean())],
+        }
+
+    manifest = {
+        "cluster_col": cluster_col,
+        "build": build,
+        "model_path": os.path.abspath(model_path),
+        "model_hash": file_hash(model_path),
+        "data_path": os.path.abspath(data_path),
+        "data_mtime": os.path.getmtime(data_path),
+        "data_size": os.path.getsize(data_path),
+        "built_at": time.time(),
+        "clusters": clusters,
+    }
+
+    # The manifest switch is the commit point: until it lands, the old build stays valid
+    previous = (load_manifest(out_dir) or {}).get("build")
+    tmp_path = os.path.join(out_dir, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+
+    # Builds before the previous one, and leftovers of interrupted ones, are no longer referenced
+    for name in os.listdir(os.path.join(out_dir, BUILDS_DIR)):
+        if os.path.join(BUILDS_DIR, name) not in (build, previous):
+            shutil.rmtree(os.path.join(out_dir, BUILDS_DIR, name), ignore_errors=True)
+
+    print(f"💾 Wrote {len(clusters)} cluster partitions → {out_dir}")
+    return manifest
+
+
+def is_stale(manifest, data_path: str, model_path: str, cluster_col: str = "cluster") -> bool:
+    if manifest is None or manifest.get("cluster_col") != cluster_col:
+        return True
+    if manifest.get("data_path") != os.path.abspath(data_path):
+        return True
+    if (manifest.get("data_mtime") != os.path.getmtime(data_path)
+            or manifest.get("data_size") != os.path.getsize(data_path)):
+        return True
+    return manifest.get("model_hash") != file_hash(model_path)
+
+
+def ensure_partitions(data_path: str, model_path: str, out_dir: str, cluster_col: str = "cluster") -> dict:
+    """Return the current manifest, rebuilding the partitions only if the model or data changed."""
+    manifest = load_manifest(out_dir)
+    if is_stale(manifest, data_path, model_path, cluster_col):
+        manifest = build_partitions(data_path, model_path, out_dir, cluster_col)
+    return manifest
+
+
+def read_partition(out_dir: str, cluster_id: int, manifest: dict = None) -> pd.DataFrame:
+    """Rows of one cluster. Raises KeyError for a cluster that has no records."""
+    manifest = manifest or load_manifest(out_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No cluster manifest found in: {out_dir}")
+    entry = manifest["clusters"].get(str(int(cluster_id)))
+    if entry is None:
+        raise KeyError(f"Cluster {cluster_id} has no records in {out_dir}")
+    return pd.read_parquet(os.path.join(out_dir, entry["file"]), engine="pyarrow")
+
+
+if __name__ == "__main__":
+    data_path = r"E:\Hydroneo\Analytics\disease\data\cleaned_data_removed_ZERO.parquet"
+    model_path = r"E:\Hydroneo\Analytics\disease\models\kmean_2_model_20251029_111224.onnx"
+    out_dir = r"E:\Hydroneo\Analytics\disease\data\cluster_partitions"
+
+    manifest = ensure_partitions(data_path, model_path, out_dir)
+    print(f"✅ Model hash: {manifest['model_hash']}")
+    for cluster_id, entry in manifest["clusters"].items():
+        print(f"Cluster {cluster_id}: {entry['rows']} rows, centroid {entry['centroid']}")
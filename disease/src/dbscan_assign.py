@@ -0,0 +1,48 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+from proximity_index import km_to_radians
+
+
+class DBSCANCoreIndex:
+    """
+    Assign new points to an existing DBSCAN clustering.
+    Only core samples are indexed (haversine BallTree): a new point joins the
+    cluster of its nearest core point if that point is within eps, else it is noise (-1).
+    """
+
+    def __init__(self, core_coords_rad: np.ndarray, core_labels: np.ndarray, eps_rad: float):
+        self.core_labels = np.asarray(core_labels)
+        self.eps_rad = float(eps_rad)
+        self.tree = BallTree(np.asarray(core_coords_rad, dtype=np.float64), metric="haversine")
+
+    @classmethod
+    def from_model(cls, db):
+        """Build from a fitted DBSCAN that was trained on radian (lat, lon) coordinates."""
+        core_labels = db.labels_[db.core_sample_indices_]
+        return cls(db.components_, core_labels, db.eps)
+
+    @classmethod
+    def from_labels(cls, lats, lons, labels, core_sample_indices, eps_km: float):
+        coords_rad = np.radians(np.column_stack([lats, lons]))
+        core_idx = np.asarray(core_sample_indices, dtype=int)
+        return cls(coords_rad[core_idx], np.asarray(labels)[core_idx], km_to_radians(eps_km))
+
+    def __len__(self) -> int:
+        return len(self.core_labels)
+
+    def assign_batch(self, lats, lons) -> np.ndarray:
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        result = np.full(len(lats), -1, dtype=int)
+        if len(self) == 0 or len(lats) == 0:
+            return result
+
+        points = np.radians(np.column_stack([lats, lons]))
+        dist, idx = self.tree.query(points, k=1, return_distance=True)
+        within = dist[:, 0] <= self.eps_rad
+        result[within] = self.core_labels[idx[within, 0]]
+        return result
+
+    def assign(self, lat: float, lon: float) -> int:
+        return int(self.assign_batch([lat], [lon])[0])
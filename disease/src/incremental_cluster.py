@@ -0,0 +1,489 @@
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from sklearn.cluster import DBSCAN, MiniBatchKMeans
+from sklearn.neighbors import BallTree
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+from proximity_index import haversine_vectorized, km_to_radians
+
+STATE_NAME = "state.json"
+RECORDS_DIR = "records"
+KMEANS_MODEL_NAME = "kmeans_model.pkl"
+KMEANS_ONNX_NAME = "kmeans_model.onnx"
+REPORT_NAME = "last_report.json"
+
+
+# ---------------------------------------------------------------------------
+# Mongo ingestion
+# ---------------------------------------------------------------------------
+
+def fetch_new_locations(collection, last_id: str = None, batch_size: int = 5000):
+    """
+    Read disease documents with _id greater than the checkpoint, in _id order.
+    Returns (DataFrame[id, latitude, longitude], new_last_id).
+    """
+    query = {"_id": {"$gt": ObjectId(last_id)}} if last_id else {}
+    cursor = (
+        collection.find(query, {"diseaseLocation": 1, "_id": 1})
+        .sort("_id", 1)
+        .batch_size(batch_size)
+    )
+
+    ids, lats, lons = [], [], []
+    for doc in cursor:
+        last_id = str(doc["_id"])
+        loc = doc.get("diseaseLocation") or {}
+        lat, lon = loc.get("latitude"), loc.get("longitude")
+        # Documents without a location still advance the checkpoint
+        if lat is None or lon is None:
+            continue
+        ids.append(last_id)
+        lats.append(float(lat))
+        lons.append(float(lon))
+
+    df = pd.DataFrame({
+        "id": ids,
+        "latitude": np.asarray(lats, dtype=np.float64),
+        "longitude": np.asarray(lons, dtype=np.float64),
+    })
+    return df, last_id
+
+
+# ---------------------------------------------------------------------------
+# KMeans path
+# ---------------------------------------------------------------------------
+
+def to_minibatch(model, df_hist: pd.DataFrame, batch_size: int = 1024) -> MiniBatchKMeans:
+    """
+    One-time conversion of a batch KMeans into a MiniBatchKMeans seeded with its centres.
+    The history is replayed once so the per-centre counts reflect the existing data.
+    """
+    if isinstance(model, MiniBatchKMeans):
+        return model
+    mb = MiniBatchKMeans(
+        n_clusters=model.n_clusters, init=model.cluster_centers_, n_init=1,
+        batch_size=batch_size, random_state=42
+    )
+    mb.partial_fit(df_hist[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+    return mb
+
+
+def update_kmeans(model: MiniBatchKMeans, df_new: pd.DataFrame):
+    """partial_fit on the new records only. Returns (new_labels, report)."""
+    X_new = df_new[['latitude', 'longitude']].to_numpy(dtype=np.float64)
+    if len(X_new) == 0:
+        return np.empty(0, dtype=int), {}
+
+    old_centers = model.cluster_centers_.copy()
+    model.partial_fit(X_new)
+    labels = model.predict(X_new)
+
+    shift_km = haversine_vectorized(
+        old_centers[:, 0], old_centers[:, 1],
+        model.cluster_centers_[:, 0], model.cluster_centers_[:, 1]
+    )
+    added = np.bincount(labels, minlength=model.n_clusters)
+    report = {
+        str(c): {"added": int(added[c]), "center_shift_km": float(shift_km[c])}
+        for c in np.flatnonzero(added)
+    }
+    return labels, report
+
+
+def save_kmeans(model, out_dir: str):
+    """Pickle and ONNX export. A failed conversion raises, so the run is not committed."""
+    initial_type = [("float_input", FloatTensorType([None, 2]))]
+    onnx_model = convert_sklearn(model, initial_types=initial_type)
+    joblib.dump(model, os.path.join(out_dir, KMEANS_MODEL_NAME))
+    with open(os.path.join(out_dir, KMEANS_ONNX_NAME), "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+
+# ---------------------------------------------------------------------------
+# DBSCAN path
+# ---------------------------------------------------------------------------
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = x
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while x != root:
+            nxt = self.parent.get(x, x)
+            self.parent[x] = root
+            x = nxt
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        # The older (smaller) cluster id survives a merge
+        if rb < ra:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+
+
+class PointIndex:
+    """
+    Haversine index over the stored points: the persisted BallTree over the
+    first n_base points (loaded memory-mapped) plus a small BallTree over the
+    points stored since, which is the only tree built per run.
+    """
+
+    def __init__(self, base_tree: BallTree = None, delta: np.ndarray = None):
+        self.base_tree = base_tree
+        self.base_rad = np.asarray(base_tree.data) if base_tree is not None else np.empty((0, 2))
+        self.delta_rad = np.radians(delta) if delta is not None else np.empty((0, 2))
+        self.delta_tree = BallTree(self.delta_rad, metric="haversine") if len(self.delta_rad) else None
+
+    def __len__(self) -> int:
+        return len(self.base_rad) + len(self.delta_rad)
+
+    def coords_rad(self, idx: np.ndarray) -> np.ndarray:
+        idx = np.asarray(idx, dtype=np.intp)
+        n_base = len(self.base_rad)
+        in_base = idx < n_base
+        out = np.empty((len(idx), 2))
+        out[in_base] = self.base_rad[idx[in_base]]
+        out[~in_base] = self.delta_rad[idx[~in_base] - n_base]
+        return out
+
+    def query_radius(self, coords_rad: np.ndarray, r: float) -> list:
+        """Global indices within r (radians) of each query point."""
+        empty = [np.empty(0, dtype=np.intp)] * len(coords_rad)
+        base = self.base_tree.query_radius(coords_rad, r=r) if self.base_tree is not None else empty
+        if self.delta_tree is None:
+            return list(base)
+        delta = self.delta_tree.query_radius(coords_rad, r=r)
+        return [np.concatenate([b, d + len(self.base_rad)]) for b, d in zip(base, delta)]
+
+
+class IncrementalDBSCAN:
+    """
+    Incremental DBSCAN (haversine) over an existing labelling.
+
+    Inserting points only searches the eps-neighbourhoods of the new points
+    (and of stored points they turn into cores): neighbour counts are bumped,
+    new cores are linked to the clusters of their core neighbours, and noise
+    next to a new core becomes border. Clusters are never split by insertions.
+    """
+
+    def __init__(self, index: PointIndex, labels, counts, eps_km: float, min_samples: int,
+                 next_label: int = 0):
+        self.index = index
+        self.labels = labels
+        self.counts = counts
+        self.eps = km_to_radians(eps_km)
+        self.min_samples = min_samples
+        self.next_label = next_label
+
+    def insert(self, lats, lons):
+        """
+        (labels, counts, report) for the stored points followed by the new ones.
+        The stored arrays are not modified.
+        """
+        new_lats = np.asarray(lats, dtype=np.float64)
+        new_lons = np.asarray(lons, dtype=np.float64)
+        n_old, m = len(self.index), len(new_lats)
+        new_rad = np.radians(np.column_stack([new_lats, new_lons]))
+        new_tree = BallTree(new_rad, metric="haversine")
+        old_nb = self.index.query_radius(new_rad, self.eps)
+        new_nb = new_tree.query_radius(new_rad, r=self.eps)
+        neigh = {n_old + i: np.concatenate([old_nb[i], new_nb[i] + n_old]) for i in range(m)}
+
+        # Neighbour counts (self included, as in sklearn): stored points gain one per new neighbour
+        counts = np.concatenate([self.counts, [len(nb) for nb in neigh.values()]]).astype(np.int64)
+        touched, gained = np.unique(np.concatenate(old_nb).astype(np.int64), return_counts=True)
+        was_core = counts[touched] >= self.min_samples
+        counts[touched] += gained
+        is_core = counts >= self.min_samples
+        labels = np.concatenate([self.labels, np.full(m, -1)]).astype(np.int64)
+
+        newly_core = touched[~was_core & is_core[touched]]
+        if len(newly_core):
+            pts = self.index.coords_rad(newly_core)
+            for j, a, b in zip(newly_core.tolist(), self.index.query_radius(pts, self.eps),
+                                new_tree.query_radius(pts, r=self.eps)):
+                neigh[j] = np.concatenate([a, b + n_old])
+
+        first_new_label = next_label = self.next_label
+        cores = [p for p in neigh if is_core[p]]
+        for p in cores:
+            if labels[p] < 0:
+                labels[p] = next_label
+                next_label += 1
+        uf = _UnionFind()
+        for p in cores:
+            nb = neigh[p]
+            for q in nb[is_core[nb]].tolist():
+                uf.union(int(labels[p]), int(labels[q]))
+            # Stored noise inside a new core's neighbourhood becomes border
+            border = nb[(nb < n_old) & ~is_core[nb] & (labels[nb] < 0)]
+            labels[border] = labels[p]
+
+        # New non-core points join the cluster of their nearest core neighbour
+        for i in range(m):
+            p = n_old + i
+            cand = neigh[p][is_core[neigh[p]]]
+            if is_core[p] or not len(cand):
+                continue
+            is_new = cand >= n_old
+            c = np.empty((len(cand), 2))
+            c[is_new] = new_rad[cand[is_new] - n_old]
+            c[~is_new] = self.index.coords_rad(cand[~is_new])
+            c = np.degrees(c)
+            d = haversine_vectorized(c[:, 0], c[:, 1], new_lats[i], new_lons[i])
+            labels[p] = labels[cand[np.argmin(d)]]
+
+        # Relabel merged clusters to the surviving id
+        lut = np.arange(next_label)
+        for label in list(uf.parent):
+            lut[label] = uf.find(label)
+        labelled = labels >= 0
+        labels[labelled] = lut[labels[labelled]]
+
+        added = labels[n_old:][labels[n_old:] >= 0]
+        ids, cnt = np.unique(added, return_counts=True)
+        report = {
+            "created": sorted({int(lut[c]) for c in range(first_new_label, next_label)} - set(range(first_new_label))),
+            "merged": {int(c): int(lut[c]) for c in range(first_new_label) if lut[c] != c},
+            "grown": {str(int(c)): int(n) for c, n in zip(ids, cnt)},
+        }
+        self.next_label = next_label
+        return labels, counts, report
+
+
+# ---------------------------------------------------------------------------
+# State directory
+# ---------------------------------------------------------------------------
+
+class ClusterStore:
+    """
+    Incremental clustering state:
+
+    - state.json: last _id read, point count, radii, min_samples, next DBSCAN
+      label per radius and the size of the persisted tree
+    - records/part-<first row>.parquet: id, latitude, longitude, cluster_kmeans, one per run
+    - tree-<n_base>.pkl: BallTree over the first n_base points
+    - v-<n_points>/: KMeans model (pickle + ONNX) and labels/counts_<km>km.npy
+
+    A run writes its records part and a new v-<n_points> directory, then
+    replaces state.json, which commits it. An interrupted run leaves the
+    previous state in effect and is simply repeated by the next one.
+    """
+
+    def __init__(self, state_dir: str, rebuild_fraction: float = 0.25, state: dict = None):
+        self.state_dir = state_dir
+        self.rebuild_fraction = rebuild_fraction
+        if state is None:
+            with open(self._path(STATE_NAME), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        self.state = state
+
+    def _path(self, *names) -> str:
+        return os.path.join(self.state_dir, *names)
+
+    def version_path(self, name: str) -> str:
+        return self._path(f"v-{self.n_points}", name)
+
+    @property
+    def radii(self) -> list:
+        return self.state["radii"]
+
+    @property
+    def n_points(self) -> int:
+        return self.state["n_points"]
+
+    def records(self, start: int = 0) -> pd.DataFrame:
+        """Stored records from row `start` (a run boundary) on."""
+        parts = []
+        for name in sorted(os.listdir(self._path(RECORDS_DIR))):
+            # A part from an interrupted run starts at n_points and is not committed
+            if start <= int(name[len("part-"):-len(".parquet")]) < self.n_points:
+                parts.append(pd.read_parquet(self._path(RECORDS_DIR, name), engine="pyarrow"))
+        if not parts:
+            return pd.DataFrame({"id": [], "latitude": [], "longitude": [], "cluster_kmeans": []})
+        return pd.concat(parts, ignore_index=True)
+
+    def index(self) -> PointIndex:
+        n_base = self.state["n_base"]
+        tree = joblib.load(self._path(f"tree-{n_base}.pkl"), mmap_mode="r") if n_base else None
+        delta = self.records(n_base)[['latitude', 'longitude']].to_numpy(dtype=np.float64)
+        return PointIndex(tree, delta)
+
+    def dbscan(self, km, index: PointIndex = None) -> IncrementalDBSCAN:
+        return IncrementalDBSCAN(index or self.index(),
+                                 np.load(self.version_path(f"labels_{km}km.npy")),
+                                 np.load(self.version_path(f"counts_{km}km.npy")),
+                                 km, self.state["min_samples"], self.state["next_label"][str(km)])
+
+    def _write_state(self, state: dict):
+        tmp_path = self._path(STATE_NAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path(STATE_NAME))
+        self.state = state
+
+    def commit(self, state: dict, report: dict, records: pd.DataFrame = None, kmeans=None, dbscan: dict = None):
+        """Persist a run; dbscan maps km -> (labels, counts) over every point."""
+        if records is not None:
+            os.makedirs(self._path(RECORDS_DIR), exist_ok=True)
+            records.to_parquet(self._path(RECORDS_DIR, f"part-{self.n_points:012d}.parquet"), index=False)
+            version_dir = self._path(f"v-{state['n_points']}")
+            os.makedirs(version_dir, exist_ok=True)
+            save_kmeans(kmeans, version_dir)
+            for km, (labels, counts) in dbscan.items():
+                np.save(os.path.join(version_dir, f"labels_{km}km.npy"), labels)
+                np.save(os.path.join(version_dir, f"counts_{km}km.npy"), counts)
+
+        # The checkpoint (last_id) advances only here, after models and labels are on disk
+        self._write_state(state)
+        with open(self._path(REPORT_NAME), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        for name in os.listdir(self.state_dir):
+            if name.startswith("v-") and name != f"v-{self.n_points}":
+                shutil.rmtree(self._path(name))
+        self.maybe_rebuild()
+
+    def maybe_rebuild(self, force: bool = False):
+        """Rebuild the base tree once the delta exceeds rebuild_fraction of it."""
+        n_base, n_points = self.state["n_base"], self.n_points
+        if n_points == n_base or not (force or n_points - n_base > self.rebuild_fraction * max(n_base, 1)):
+            return
+        coords = self.records()[['latitude', 'longitude']].to_numpy(dtype=np.float64)
+        tmp_path = self._path(f"tree-{n_points}.pkl.tmp")
+        joblib.dump(BallTree(np.radians(coords), metric="haversine"), tmp_path)
+        os.replace(tmp_path, self._path(f"tree-{n_points}.pkl"))
+        self._write_state({**self.state, "n_base": n_points})
+        if n_base and os.path.exists(self._path(f"tree-{n_base}.pkl")):
+            os.remove(self._path(f"tree-{n_base}.pkl"))
+
+
+def load_labels(state_dir: str) -> pd.DataFrame:
+    """Every stored record with its cluster_{km}km label and n_neighbors_{km}km count."""
+    store = ClusterStore(state_dir)
+    df = store.records()
+    for km in store.radii:
+        df[f'cluster_{km}km'] = np.load(store.version_path(f"labels_{km}km.npy"))
+        df[f'n_neighbors_{km}km'] = np.load(store.version_path(f"counts_{km}km.npy"))
+    return df
+
+
+def export_models(state_dir: str, out_dir: str = None):
+    """
+    Write dbscan_{km}km_model.pkl files (usable with DBSCANCoreIndex.from_model)
+    for the current state. Reads every record, so it is run on demand.
+    """
+    store = ClusterStore(state_dir)
+    df = load_labels(state_dir)
+    coords_rad = np.radians(df[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+    for km in store.radii:
+        core_idx = np.flatnonzero(df[f'n_neighbors_{km}km'].to_numpy() >= store.state["min_samples"])
+        model = DBSCAN(eps=km_to_radians(km), min_samples=store.state["min_samples"], metric="haversine")
+        model.labels_ = df[f'cluster_{km}km'].to_numpy()
+        model.core_sample_indices_ = core_idx
+        model.components_ = coords_rad[core_idx]
+        model.n_features_in_ = 2
+        joblib.dump(model, os.path.join(out_dir or state_dir, f"dbscan_{km}km_model.pkl"))
+
+
+# ---------------------------------------------------------------------------
+# Orchestration
+# ---------------------------------------------------------------------------
+
+def seed_state(df: pd.DataFrame, kmeans_model, state_dir: str, last_id: str,
+               radii: list = [10, 30, 50], min_samples: int = 2):
+    """
+    Write the initial incremental state from a full training run:
+    df must hold id/latitude/longitude plus cluster_kmeans and cluster_{km}km labels.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    for name in os.listdir(state_dir):
+        # A previous state in the same directory is replaced, not extended
+        path = os.path.join(state_dir, name)
+        if name == RECORDS_DIR or name.startswith("v-"):
+            shutil.rmtree(path)
+        elif name.startswith("tree-") or name == STATE_NAME:
+            os.remove(path)
+
+    coords_rad = np.radians(df[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+    tree = BallTree(coords_rad, metric="haversine")
+    state = {"last_id": last_id, "n_points": len(df), "n_base": 0, "radii": list(radii),
+             "min_samples": min_samples, "next_label": {}}
+    dbscan = {}
+    for km in radii:
+        labels = df[f'cluster_{km}km'].to_numpy(dtype=np.int64)
+        counts = tree.query_radius(coords_rad, r=km_to_radians(km), count_only=True).astype(np.int64)
+        dbscan[km] = (labels, counts)
+        state["next_label"][str(km)] = int(labels.max()) + 1 if len(labels) and labels.max() >= 0 else 0
+
+    store = ClusterStore(state_dir, state={**state, "n_points": 0})
+    store.commit(state, {"seeded": len(df)},
+                 df[['id', 'latitude', 'longitude', 'cluster_kmeans']].astype({'cluster_kmeans': int}),
+                 to_minibatch(kmeans_model, df), dbscan)
+
+
+def update_dbscan(store: ClusterStore, df_new: pd.DataFrame, state: dict, report: dict) -> dict:
+    """km -> (labels, counts) after inserting df_new; next labels and reports go into state/report."""
+    index = store.index()
+    dbscan = {}
+    for km in store.radii:
+        dbi = store.dbscan(km, index)
+        labels, counts, report[f"dbscan_{km}km"] = dbi.insert(df_new['latitude'], df_new['longitude'])
+        dbscan[km] = (labels, counts)
+        state["next_label"][str(km)] = dbi.next_label
+    return dbscan
+
+
+def run_incremental_update(collection, state_dir: str, batch_size: int = 5000) -> dict:
+    """
+    Cluster the records added since the last run. Neighbourhood searches and
+    the KMeans update only involve the new records (the stored tree is
+    memory-mapped); the per-radius label arrays are copied once per run.
+    """
+    store = ClusterStore(state_dir)
+    last_id = store.state["last_id"]
+    df_new, new_last_id = fetch_new_locations(collection, last_id, batch_size=batch_size)
+    report = {"since_id": last_id, "last_id": new_last_id, "new_records": len(df_new)}
+    if new_last_id == last_id:
+        return report
+
+    state = {**store.state, "last_id": new_last_id, "next_label": dict(store.state["next_label"])}
+    if not len(df_new):
+        store.commit(state, report)
+        return report
+
+    model = joblib.load(store.version_path(KMEANS_MODEL_NAME))
+    labels, report["kmeans"] = update_kmeans(model, df_new)
+    dbscan = update_dbscan(store, df_new, state, report)
+    state["n_points"] = store.n_points + len(df_new)
+
+    store.commit(state, report, df_new.assign(cluster_kmeans=labels.astype(int)), model, dbscan)
+    return report
+
+
+if __name__ == "__main__":
+    from mongo.connection import MongoConnection
+
+    state_dir = r"E:\Hydroneo\Analytics\disease\data\incremental"
+
+    mongo = MongoConnection(collections=os.getenv("DISEASE_COLLECTION"))
+    mongo.connect()
+    _, collection = mongo.get_db()
+
+    start = time.time()
+    report = run_incremental_update(collection, state_dir)
+    print(json.dumps(report, indent=2))
+    print(f"Time taken: {time.time() - start:.4f} seconds")
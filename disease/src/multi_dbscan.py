@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
+
+from proximity_index import km_to_radians
+
+
+def radius_graph(coords_rad: np.ndarray, max_km: float, n_jobs: int = -1):
+    """Sparse haversine distance graph of every pair within max_km (self-loops and duplicates kept)."""
+    nn = NearestNeighbors(radius=km_to_radians(max_km), metric="haversine", n_jobs=n_jobs)
+    nn.fit(coords_rad)
+    return nn.radius_neighbors_graph(coords_rad, mode="distance")
+
+
+def fit_multi_dbscan(df: pd.DataFrame, radii: list = [10, 30, 50], min_samples: int = 1,
+                     n_jobs: int = -1) -> dict:
+    """
+    Fit DBSCAN for every radius from one neighbour graph built at the largest radius.
+    Each per-radius fit only thresholds the precomputed graph, so cost is driven by
+    max(radii) rather than len(radii).
+
+    Returns {km: DBSCAN}. The returned models look like DBSCAN(metric='haversine')
+    fitted on radian coordinates (components_ are the core coordinates), so they can
+    be saved and used with DBSCANCoreIndex.from_model as before.
+    """
+    coords_rad = np.radians(df[['latitude', 'longitude']].to_numpy(dtype=np.float64))
+    graph = radius_graph(coords_rad, max(radii), n_jobs=n_jobs)
+
+    models = {}
+    for km in sorted(radii, reverse=True):
+        eps = km_to_radians(km)
+        db = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed", n_jobs=n_jobs).fit(graph)
+
+        # Same fitted state a haversine fit on the coordinates would have
+        model = DBSCAN(eps=eps, min_samples=min_samples, metric="haversine")
+        model.labels_ = db.labels_
+        model.core_sample_indices_ = db.core_sample_indices_
+        model.components_ = coords_rad[db.core_sample_indices_].copy()
+        model.n_features_in_ = coords_rad.shape[1]
+        models[km] = model
+    return {km: models[km] for km in radii}
@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+# thai-geo is not an importable package name, so the module is loaded from its file
+GET_GEO_PATH = os.path.join(REPO_ROOT, "thai-geo", "get-geo.py")
+
+ADMIN_COLUMNS = [
+    "province_th", "province_en",
+    "district_th", "district_en",
+    "subdistrict_th", "subdistrict_en",
+    "province_code", "district_code", "subdistrict_code",
+]
+
+
+def load_locator(adm3_path: str = None, grid_path: str = None):
+    """ThaiAdminLocator from thai-geo/get-geo.py (THAI_ADM3_PATH / THAI_ADM_GRID_PATH by default)."""
+    spec = importlib.util.spec_from_file_location("thai_geo_get_geo", GET_GEO_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    adm3_path = adm3_path or os.getenv("THAI_ADM3_PATH")
+    if not adm3_path:
+        raise ValueError("THAI_ADM3_PATH is not set")
+    return module.ThaiAdminLocator(adm3_path, grid_path=grid_path or os.getenv("THAI_ADM_GRID_PATH"))
+
+
+class ProvinceTagger:
+    """
+    Offline province/district/subdistrict tagging with the local ThaiAdminLocator.
+
+    Coordinates are rounded to `decimals` (4 ≈ 11 m) and only rounded
+    coordinates not seen before go through latlon_to_admin_bulk, in one
+    vectorized call per tag(); the answers are memoized for later calls.
+    """
+
+    def __init__(self, locator, decimals: int = 4, buffer_meters: float = 100.0):
+        self.locator = locator
+        self.decimals = decimals
+        self.buffer_meters = buffer_meters
+        self.memo = pd.DataFrame(columns=ADMIN_COLUMNS,
+                                 index=pd.MultiIndex.from_arrays([[], []], names=["lat", "lon"]))
+
+    def lookup(self, lats, lons) -> pd.DataFrame:
+        """Admin columns for the points, aligned to the input."""
+        lats = np.round(np.asarray(lats, dtype=float), self.decimals)
+        lons = np.round(np.asarray(lons, dtype=float), self.decimals)
+        keys = pd.MultiIndex.from_arrays([lats, lons], names=["lat", "lon"])
+
+        unique = keys.unique()
+        new = unique[~unique.isin(self.memo.index)]
+        if len(new):
+            found = self.locator.latlon_to_admin_bulk(
+                new.get_level_values("lat").to_numpy(), new.get_level_values("lon").to_numpy(),
+                buffer_meters=self.buffer_meters,
+            )
+            found.index = new
+            found = found.reindex(columns=ADMIN_COLUMNS)
+            self.memo = found if self.memo.empty else pd.concat([self.memo, found])
+
+        return self.memo.reindex(keys).reset_index(drop=True)
+
+    def tag(self, df: pd.DataFrame, lat_col: str = "latitude", lon_col: str = "longitude") -> pd.DataFrame:
+        """df with the admin columns added (replacing any existing ones)."""
+        admin = self.lookup(df[lat_col].to_numpy(), df[lon_col].to_numpy())
+        admin.index = df.index
+        return pd.concat([df.drop(columns=[c for c in ADMIN_COLUMNS if c in df.columns]), admin], axis=1)
+
+
+def tag_parquet(input_path: str, output_path: str, tagger: ProvinceTagger,
+                lat_col: str = "latitude", lon_col: str = "longitude") -> pd.DataFrame:
+    df = pd.read_parquet(input_path, engine="pyarrow")
+    start = time.perf_counter()
+    tagged = tagger.tag(df, lat_col, lon_col)
+    elapsed = time.perf_counter() - start
+    tagged.to_parquet(output_path, index=False, engine="pyarrow")
+    print(f"Tagged {len(tagged)} rows ({len(tagger.memo)} distinct coordinates) in {elapsed:.3f}s")
+    print(f"Saved to {output_path}")
+    return tagged
+
+
+if __name__ == "__main__":
+    input_path = r"E:\Hydroneo\Analytics\disease\data\disease_locations.parquet"
+    output_path = r"E:\Hydroneo\Analytics\disease\data\disease_locations_with_province.parquet"
+
+    tagger = ProvinceTagger(load_locator())
+    tagged = tag_parquet(input_path, output_path, tagger)
+    print(tagged["province_en"].value_counts(dropna=False).head(20))
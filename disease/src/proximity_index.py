@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def km_to_radians(km: float) -> float:
+    """Convert kilometers to radians (for Earth radius)."""
+    return km / EARTH_RADIUS_KM
+
+
+def haversine_vectorized(lat1, lon1, lat2, lon2):
+    R = EARTH_RADIUS_KM  # Earth's radius in km
+    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def distance_score_vectorized(distances):
+    scores = np.zeros_like(distances, dtype=int)
+    scores[distances < 1] = 100
+    scores[(distances >= 1) & (distances < 10)] = 80
+    scores[(distances >= 10) & (distances < 20)] = 60
+    scores[(distances >= 20) & (distances < 50)] = 40
+    # distances >= 50 will stay 0
+    return scores
+
+
+def _scan_distances(df: pd.DataFrame, lat: float, lon: float, lat_col: str, lon_col: str) -> np.ndarray:
+    return haversine_vectorized(df[lat_col].to_numpy(dtype=np.float64),
+                                df[lon_col].to_numpy(dtype=np.float64), lat, lon)
+
+
+def _scored(df: pd.DataFrame, idx: np.ndarray, dist_km: np.ndarray) -> pd.DataFrame:
+    out = df.iloc[idx].copy()
+    out["distance_km"] = dist_km
+    out["score"] = distance_score_vectorized(dist_km)
+    return out
+
+
+def scan_nearest(df: pd.DataFrame, lat: float, lon: float, k: int = 10,
+                 lat_col: str = "latitude", lon_col: str = "longitude") -> pd.DataFrame:
+    """
+    The k records closest to (lat, lon), nearest first, from one vectorized pass.
+    For a single query this is cheaper than building a DiseaseProximityIndex.
+    """
+    dist = _scan_distances(df, lat, lon, lat_col, lon_col)
+    k = min(k, len(dist))
+    idx = np.argpartition(dist, k - 1)[:k] if 0 < k < len(dist) else np.arange(k)
+    idx = idx[np.argsort(dist[idx], kind="stable")]
+    return _scored(df, idx, dist[idx])
+
+
+def scan_radius(df: pd.DataFrame, lat: float, lon: float, radius_km: float,
+                lat_col: str = "latitude", lon_col: str = "longitude") -> pd.DataFrame:
+    """Every record within radius_km of (lat, lon), nearest first, without building an index."""
+    dist = _scan_distances(df, lat, lon, lat_col, lon_col)
+    idx = np.flatnonzero(dist <= radius_km)
+    idx = idx[np.argsort(dist[idx], kind="stable")]
+    return _scored(df, idx, dist[idx])
+
+
+class DiseaseProximityIndex:
+    """
+    Haversine BallTree over disease locations, built once and queried many times.
+    Query results carry the same `distance_km` / `score` columns as the
+    haversine_vectorized + distance_score_vectorized scan they replace.
+    """
+
+    def __init__(self, df: pd.DataFrame, lat_col: str = "latitude",
+                 lon_col: str = "longitude", leaf_size: int = 40):
+        self.df = df
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        coords = self.df[[lat_col, lon_col]].to_numpy(dtype=np.float64)
+        self.tree = BallTree(np.radians(coords), metric="haversine", leaf_size=leaf_size)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _to_frame(self, idx: np.ndarray, dist_rad: np.ndarray) -> pd.DataFrame:
+        out = self.df.iloc[idx].copy()
+        out["distance_km"] = dist_rad * EARTH_RADIUS_KM
+        out["score"] = distance_score_vectorized(out["distance_km"].to_numpy())
+        return out
+
+    def query_radius(self, lat: float, lon: float, radius_km: float,
+                     sort: bool = True) -> pd.DataFrame:
+        """Return every record within radius_km of (lat, lon), nearest first."""
+        point = np.radians([[lat, lon]])
+        idx, dist = self.tree.query_radius(
+            point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=sort
+        )
+        return self._to_frame(idx[0], dist[0])
+
+    def query_nearest(self, lat: float, lon: float, k: int = 10) -> pd.DataFrame:
+        """Return the k records closest to (lat, lon), nearest first."""
+        k = min(k, len(self))
+        if k == 0:
+            return self._to_frame(np.empty(0, dtype=int), np.empty(0))
+        point = np.radians([[lat, lon]])
+        dist, idx = self.tree.query(point, k=k, return_distance=True, sort_results=True)
+        return self._to_frame(idx[0], dist[0])
+
+    def count_radius(self, lat: float, lon: float, radius_km: float) -> int:
+        point = np.radians([[lat, lon]])
+        return int(self.tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, count_only=True)[0])
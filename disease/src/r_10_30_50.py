@@ -1,21 +1,6 @@
 import pandas as pd
-import numpy as np
-from sklearn.cluster import DBSCAN
 
-
-def km_to_radians(km: float) -> float:
-    return km / 6371.0
-
-
-def run_dbscan(df: pd.DataFrame, km: float, min_samples: int = 1) -> pd.DataFrame:
-    coords = df[['latitude', 'longitude']].to_numpy()
-    coords_rad = np.radians(coords)
-
-    eps = km_to_radians(km)
-    db = DBSCAN(eps=eps, min_samples=min_samples, metric='euclidean')
-
-    df[f'cluster_{km}km'] = db.fit_predict(coords_rad)
-    return df
+from multi_dbscan import fit_multi_dbscan
 
 
 def run_multi_dbscan(
@@ -28,8 +13,10 @@ def run_multi_dbscan(
     # Load data
     df = pd.read_parquet(input_path, engine=engine)
 
+    # One neighbour graph at the largest radius, thresholded per radius
+    models = fit_multi_dbscan(df, radii)
     for km in radii:
-        df = run_dbscan(df, km)
+        df[f'cluster_{km}km'] = models[km].labels_
 
     df.to_parquet(output_path, index=False)
     df.to_csv(output_path.replace(".parquet", ".csv"), index=False)
@@ -2,32 +2,28 @@ import pandas as pd
 from sklearn.cluster import DBSCAN
 import numpy as np
 import matplotlib.pyplot as plt
-from geopy.distance import geodesic
+
+from dbscan_assign import DBSCANCoreIndex
 
 
 def km_to_radians(km: float) -> float:
     return km / 6371.0
 
 
-def cluster_locations(df: pd.DataFrame, eps_km: float, min_samples: int = 2) -> pd.Series:
+def fit_dbscan(df: pd.DataFrame, eps_km: float, min_samples: int = 2) -> DBSCAN:
     coords = df[['latitude', 'longitude']].to_numpy()
     coords_rad = np.radians(coords)
     db = DBSCAN(eps=km_to_radians(eps_km), min_samples=min_samples, metric='haversine')
-    
-    return db.fit_predict(coords_rad)
+    return db.fit(coords_rad)
+
+
+def cluster_locations(df: pd.DataFrame, eps_km: float, min_samples: int = 2) -> pd.Series:
+    return fit_dbscan(df, eps_km, min_samples).labels_
 
 
-def assign_new_point(new_lat: float, new_lon: float, df: pd.DataFrame,
-                     cluster_col: str, eps_km: float) -> int:
-    for cluster_id in df[cluster_col].unique():
-        if cluster_id == -1:  # skip noise
-            continue
-        cluster_points = df[df[cluster_col] == cluster_id][['latitude', 'longitude']].to_numpy()
-        for lat, lon in cluster_points:
-            distance = geodesic((new_lat, new_lon), (lat, lon)).km
-            if distance <= eps_km:
-                return cluster_id
-    return -1  # noise
+def assign_new_point(new_lat: float, new_lon: float, core_index: DBSCANCoreIndex) -> int:
+    # Nearest core sample within eps decides the cluster; otherwise noise (-1)
+    return core_index.assign(new_lat, new_lon)
 
 
 def plot_clusters(df: pd.DataFrame, cluster_col: str,
@@ -64,11 +60,13 @@ if __name__ == "__main__":
     # Choose cluster radius (km)
     eps_km = 100
     cluster_col = f"cluster_{eps_km}km"
-    df[cluster_col] = cluster_locations(df, eps_km=eps_km)
+    db = fit_dbscan(df, eps_km=eps_km)
+    df[cluster_col] = db.labels_
+    core_index = DBSCANCoreIndex.from_model(db)
 
     # Test a new point
     new_lat, new_lon = 16.335354  ,102.254739
-    new_cluster = assign_new_point(new_lat, new_lon, df, cluster_col, eps_km)
+    new_cluster = assign_new_point(new_lat, new_lon, core_index)
     print(f"New point ({new_lat}, {new_lon}) belongs to cluster: {new_cluster}")
 
     # Plot result
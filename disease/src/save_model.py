@@ -1,36 +1,22 @@
 import pandas as pd
-import numpy as np
-from sklearn.cluster import DBSCAN
 import joblib
 import os
 
+from multi_dbscan import fit_multi_dbscan
 
-def km_to_radians(km: float) -> float:
-    """Convert kilometers to radians (for Earth radius)."""
-    return km / 6371.0
 
+def train_multi_dbscan(df: pd.DataFrame, radii: list = [10, 30, 50], min_samples: int = 1,
+                       model_dir: str = "./models") -> pd.DataFrame:
+    """Train DBSCAN for all radii from one shared neighbour graph and save model + labels per radius."""
+    models = fit_multi_dbscan(df, radii, min_samples=min_samples)
 
-def train_dbscan(df: pd.DataFrame, km: float, min_samples: int = 1, model_dir: str = "./models") -> pd.DataFrame:
-    """Train DBSCAN on latitude/longitude and save model + labels."""
-    coords = df[['latitude', 'longitude']].to_numpy()
-    coords_rad = np.radians(coords)
-
-    # Train model
-    eps = km_to_radians(km)
-    db = DBSCAN(eps=eps, min_samples=min_samples, metric="euclidean")
-    labels = db.fit_predict(coords_rad)
-
-    # Add cluster labels to DataFrame
-    df[f'cluster_{km}km'] = labels
-
-    # Ensure model directory exists
     os.makedirs(model_dir, exist_ok=True)
+    for km in radii:
+        df[f'cluster_{km}km'] = models[km].labels_
 
-    # Save model
-    model_path = os.path.join(model_dir, f"dbscan_{km}km_model.pkl")
-    joblib.dump(db, model_path)
-
-    print(f"✅ Model saved: {model_path}")
+        model_path = os.path.join(model_dir, f"dbscan_{km}km_model.pkl")
+        joblib.dump(models[km], model_path)
+        print(f"✅ Model saved: {model_path}")
     return df
 
 
@@ -43,9 +29,8 @@ if __name__ == "__main__":
     # Load dataset
     df = pd.read_parquet(input_file, engine="pyarrow")
 
-    # Train DBSCAN for multiple radii
-    for km in [10, 30, 50]:
-        df = train_dbscan(df, km=km, min_samples=2, model_dir=model_dir)
+    # Train DBSCAN for multiple radii (one neighbour graph at the largest radius)
+    df = train_multi_dbscan(df, radii=[10, 30, 50], min_samples=2, model_dir=model_dir)
 
     # Save clustered results
     df.to_parquet(output_file, index=False)
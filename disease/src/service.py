@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+import onnxruntime as ort
+from dotenv import load_dotenv
+
+from proximity_index import DiseaseProximityIndex
+from batch_score import SCORE_BANDS, score_points
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+DATA_PATH = os.getenv("DISEASE_DATA_PATH", r"E:\Hydroneo\Analytics\disease\data\cleaned_data_removed_ZERO.parquet")
+MODEL_PATH = os.getenv("DISEASE_MODEL_PATH", r"E:\Hydroneo\Analytics\disease\models\kmean_2_model_20251029_111224.onnx")
+HOST = os.getenv("DISEASE_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("DISEASE_SERVICE_PORT", "8765"))
+# /reload may only load files under these directories (default: those of the configured paths)
+RELOAD_DIRS = [d for d in os.getenv("DISEASE_RELOAD_DIRS", "").split(os.pathsep) if d]
+
+RESULT_COLUMNS = ["id", "latitude", "longitude", "cluster", "distance_km", "score"]
+
+
+class ProximityState:
+    """
+    Everything a query needs, loaded once: the dataset, its cluster labels,
+    the ONNX session and one BallTree per cluster plus one over all records.
+    Instances are never mutated after construction, so a reload just swaps
+    the reference the server holds.
+    """
+
+    def __init__(self, data_path: str, model_path: str):
+        self.data_path = data_path
+        self.model_path = model_path
+        self.loaded_at = time.time()
+
+        self.session = ort.InferenceSession(model_path)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+        if data_path.endswith(".csv"):
+            df = pd.read_csv(data_path)
+        else:
+            df = pd.read_parquet(data_path, engine="pyarrow")
+
+        # Cluster labels are computed once here, not per query
+        if "cluster" not in df.columns:
+            coords = df[['latitude', 'longitude']].to_numpy(dtype=np.float32)
+            df['cluster'] = self.session.run([self.output_name], {self.input_name: coords})[0]
+        self.df = df
+
+        self.index = DiseaseProximityIndex(df)
+        self.cluster_indexes = {
+            int(cluster_id): DiseaseProximityIndex(group)
+            for cluster_id, group in df.groupby('cluster')
+        }
+
+    def predict_cluster(self, lat: float, lon: float) -> int:
+        point = np.array([[lat, lon]], dtype=np.float32)
+        return int(self.session.run([self.output_name], {self.input_name: point})[0][0])
+
+    def _cluster_index(self, lat: float, lon: float, cluster=None):
+        """
+        (cluster id, index) to search: the predicted cluster by default, a given
+        cluster id, or every record when cluster == "all" (id None).
+        """
+        if cluster == "all":
+            return None, self.index
+        cluster_id = self.predict_cluster(lat, lon) if cluster in (None, "auto") else int(cluster)
+        return cluster_id, self.cluster_indexes.get(cluster_id)
+
+    def nearest(self, lat: float, lon: float, k: int = 10, cluster=None) -> dict:
+        cluster_id, index = self._cluster_index(lat, lon, cluster)
+        rows = index.query_nearest(lat, lon, k=k) if index is not None else None
+        return {"cluster": cluster_id, "results": _records(rows)}
+
+    def radius(self, lat: float, lon: float, radius_km: float, cluster=None) -> dict:
+        cluster_id, index = self._cluster_index(lat, lon, cluster)
+        rows = index.query_radius(lat, lon, radius_km) if index is not None else None
+        return {"cluster": cluster_id, "results": _records(rows)}
+
+    def score(self, lat: float, lon: float, k: int = 10, cluster=None) -> dict:
+        cluster_id, index = self._cluster_index(lat, lon, cluster)
+        result = {"cluster": cluster_id}
+        if index is None:
+            # Unknown cluster: nothing nearby, every band empty
+            result.update({"latitude": lat, "longitude": lon, **{f"band_{s}": 0 for s, _ in SCORE_BANDS},
+                           "max_score": 0, "nearest": []})
+            return result
+        summary, nearest = score_points(index, [lat], [lon], k=k)
+        result.update({col: summary[col].iloc[0] for col in summary.columns})
+        result["nearest"] = nearest.drop(columns=["query_idx"]).to_dict(orient="records")
+        return result
+
+    def info(self) -> dict:
+        return {
+            "data_path": self.data_path,
+            "model_path": self.model_path,
+            "records": len(self.df),
+            "clusters": len(self.cluster_indexes),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _records(rows) -> list:
+    if rows is None:
+        return []
+    cols = [c for c in RESULT_COLUMNS if c in rows.columns]
+    return rows[cols].to_dict(orient="records")
+
+
+class DiseaseProximityService:
+    def __init__(self, data_path: str, model_path: str, reload_dirs: list = None):
+        self.state = ProximityState(data_path, model_path)
+        self._reload_lock = asyncio.Lock()
+        self.reload_dirs = [os.path.realpath(d) for d in
+                            (reload_dirs or [os.path.dirname(data_path), os.path.dirname(model_path)])]
+
+    def _check_reload_path(self, path: str):
+        """/reload is unauthenticated, so it may only name files inside reload_dirs."""
+        if path is None:
+            return
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, d]) == d for d in self.reload_dirs):
+            raise PermissionError(f"{path} is outside the reload directories")
+
+    async def reload(self, data_path: str = None, model_path: str = None) -> dict:
+        self._check_reload_path(data_path)
+        self._check_reload_path(model_path)
+        async with self._reload_lock:
+            current = self.state
+            # Build off the event loop; in-flight queries keep using the old state
+            new_state = await asyncio.to_thread(
+                ProximityState, data_path or current.data_path, model_path or current.model_path
+            )
+            self.state = new_state
+        logging.info("Reloaded %s / %s", new_state.data_path, new_state.model_path)
+        return new_state.info()
+
+    async def dispatch(self, method: str, path: str, query: dict, body: bytes):
+        state = self.state  # one snapshot per request
+
+        if path == "/health":
+            return 200, state.info()
+        if path == "/reload" and method == "POST":
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise ValueError("Reload body must be a JSON object")
+            return 200, await self.reload(payload.get("data_path"), payload.get("model_path"))
+
+        if path in ("/nearest", "/radius", "/score"):
+            lat = float(query["lat"][0])
+            lon = float(query["lon"][0])
+            # "auto" (predicted, default), a cluster id, or "all"
+            cluster = query.get("cluster", ["auto"])[0]
+            if cluster not in ("auto", "all"):
+                cluster = int(cluster)
+            k = int(query.get("k", ["10"])[0])
+            if k < 0:
+                raise ValueError("k must be >= 0")
+            if path == "/nearest":
+                return 200, await asyncio.to_thread(state.nearest, lat, lon, k, cluster)
+            if path == "/radius":
+                radius_km = float(query.get("radius_km", ["50"])[0])
+                return 200, await asyncio.to_thread(state.radius, lat, lon, radius_km, cluster)
+            return 200, await asyncio.to_thread(state.score, lat, lon, k, cluster)
+
+        return 404, {"error": f"Unknown endpoint {method} {path}"}
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        """(method, target, headers, body), or None at end of stream; ValueError when malformed."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, sep, value = line.decode("latin-1").partition(":")
+            if not sep:
+                raise ValueError(f"Malformed header line {line!r}")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", "0"))
+        if length < 0:
+            raise ValueError("Negative Content-Length")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        data = json.dumps(payload, default=_json_default).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as e:
+                    # The stream can't be trusted after a malformed request, so close it
+                    await self._respond(writer, 400, {"error": f"Bad request: {e}"}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+
+                url = urlsplit(target)
+                try:
+                    status, payload = await self.dispatch(method, url.path, parse_qs(url.query), body)
+                except PermissionError as e:
+                    status, payload = 403, {"error": str(e)}
+                except (KeyError, ValueError) as e:
+                    status, payload = 400, {"error": f"Bad request: {e}"}
+                except Exception as e:
+                    logging.exception("Request failed")
+                    status, payload = 500, {"error": str(e)}
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+async def main():
+    start = time.time()
+    service = DiseaseProximityService(DATA_PATH, MODEL_PATH, RELOAD_DIRS or None)
+    print(f"✅ Loaded {service.state.info()['records']} records in {time.time() - start:.4f} seconds")
+
+    server = await asyncio.start_server(service.handle, HOST, PORT)
+    print(f"🚀 Serving on http://{HOST}:{PORT}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
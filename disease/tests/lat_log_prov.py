@@ -1,13 +1,17 @@
-from geopy.geocoders import Nominatim
+import os
+import sys
 
-geolocator = Nominatim(user_agent="my-app-name")
+# Offline: provinces come from the local tambon shapefile instead of Nominatim
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from province_tags import ProvinceTagger, load_locator
+
+tagger = ProvinceTagger(load_locator())
 
 latitude = 13.7063
 longitude = 100.4597
 
-location = geolocator.reverse((latitude, longitude), exactly_one=True)
+location = tagger.lookup([latitude], [longitude]).iloc[0]
 
-if location:
-    address = location.raw.get('address', {})
-    province = address.get('state') or address.get('province')
+if location.notna().any():
+    province = location["province_en"] or location["province_th"]
     print("Province/State:", province)
@@ -1,29 +1,3 @@
-import os
-from dotenv import load_dotenv
-import logging
-from pymongo import MongoClient
+from mongo.connection import MongoConnection, get_client, stats
 
-load_dotenv()
-logging.basicConfig(level=logging.INFO)
-
-class MongoConnection:
-    def __init__(self, collections: str, timeout_ms: int = 5000):
-        self.uri = os.getenv("MONGO_URI")
-        self.timeout_ms = timeout_ms
-        self.db_name = os.getenv("DATABASE_NAME")
-        self.collections = collections
-        
-    def connect(self) -> MongoClient:
-        if not self.uri:
-            raise ValueError("MONGO_URI is not set")
-        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=self.timeout_ms)
-        self.client.admin.command("ping")
-        logging.info("Mongo connected")
-        return self.client
-    
-    def get_db(self):
-        if not self.db_name or not self.collections:
-            raise ValueError("DATABASE_NAME or COLLECTIONS is not set")
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.collections]
-        return self.db, self.collection
\ No newline at end of file
+__all__ = ["MongoConnection", "get_client", "stats"]
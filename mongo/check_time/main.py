@@ -1,35 +1,14 @@
 import os
 import logging
 from dotenv import load_dotenv
-from pymongo import MongoClient
-from datetime import timedelta
-from collections import defaultdict
+from mongo.connection import MongoConnection
+from datetime import datetime, timedelta, timezone
+from mongo.duplicates import detect_duplicates, message_key, scan_duplicates
+from mongo.time_gaps import load_timestamps, write_gap_summary
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-class MongoConnection:
-    def __init__(self, timeout_ms: int = 5000):
-        self.uri = os.getenv("MONGO_URI")
-        self.timeout_ms = timeout_ms
-        self.db_name = os.getenv("DATABASE_NAME")
-        self.collections = "message_resource_messages"
-        
-    def connect(self) -> MongoClient:
-        if not self.uri:
-            raise ValueError("MONGO_URI is not set")
-        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=self.timeout_ms)
-        self.client.admin.command("ping")
-        logging.info("Mongo connected")
-        return self.client
-    
-    def get_db(self):
-        if not self.db_name or not self.collections:
-            raise ValueError("DATABASE_NAME or NOTIFICATION_COLLECTION is not set")
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.collections]
-        return self.db, self.collection
-    
 def time_analytics(matches):
     timestamps = []
     
@@ -69,55 +48,55 @@ def check_15min_duplicates(matches):
         last_time = t
         
 def check_duplicate_info(matches, window_minutes=15):
-    seen = defaultdict(list)  # key -> list of timestamps
-    duplicates = []
-
-    for m in matches:
-        org = str(m.get("organisationId"))
-        farm = str(m.get("farmId"))
-        pond = str(m.get("pondId"))
-        gw = str(m.get("gatewayId"))
-        type_ = m.get("type")
-        wp = m.get("data", {}).get("nodes", {}).get("waterParameterClass", {}).get("value")
-
-        ts = m.get("createdTimestamp")
-        if not ts:
-            continue
-
-        # composite key for uniqueness
-        key = (org, farm, pond, gw, type_, wp)
-
-        # check previous timestamps for this key
-        for prev in seen[key]:
-            gap = abs((ts - prev).total_seconds()) / 60
-            if gap < window_minutes:
-                duplicates.append((key, prev, ts, gap))
-
-        seen[key].append(ts)
+    # sort by (key, time) so the sliding window sees each key's messages in order
+    rows = sorted(
+        (m for m in matches if m.get("createdTimestamp")),
+        key=lambda m: (tuple(map(str, message_key(m)[:5])), m["createdTimestamp"]),
+    )
+    duplicates = list(detect_duplicates(rows, window_minutes))
 
     # print duplicates
     if not duplicates:
         print("✅ No duplicates found within window")
     else:
         print("⚠️ Duplicates found:")
-        for key, prev, ts, gap in duplicates:
+        for key, prev, ts, gap, _ in duplicates:
             print(f"{key} -> {prev} vs {ts} (gap {gap:.3f} min)")
-    
+
+
+def print_duplicate_summary(stats, top=20):
+    print(f"Messages: {stats.messages}, duplicates: {stats.duplicates}")
+    per_day = stats.per_day_frame()
+    if not per_day.empty:
+        print("\nPer day:")
+        print(per_day.to_string(index=False))
+    per_key = stats.per_key_frame()
+    if not per_key.empty:
+        print(f"\nTop {top} keys by duplicates:")
+        print(per_key.head(top).to_string(index=False))
+
+
 if __name__ == "__main__":
-    mongo = MongoConnection()
+    mongo = MongoConnection(collections="message_resource_messages")
     client = mongo.connect()
     db, collection = mongo.get_db()
 
     
-    query = {}
-
-    matches = list(
-        collection.find(query).sort("createdTimestamp", -1).limit(10)
-    )
-    
-    # time_analytics(matches)
-    # display_data(matches)
-    check_15min_duplicates(matches)
-    # check_duplicate_info(matches, window_minutes=15)
+    days = int(os.getenv("DUPLICATE_DAYS", "30"))
+    window_minutes = float(os.getenv("DUPLICATE_WINDOW_MINUTES", "15"))
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
 
+    if os.getenv("CHECK_MODE", "duplicates") == "gaps":
+        # Gap distribution per key without printing every gap
+        table = load_timestamps(collection, start, end)
+        summary = write_gap_summary(table, os.getenv("GAP_SUMMARY_PATH", "time_gap_summary.parquet"),
+                                    threshold_minutes=window_minutes)
+        print(summary[summary["scope"] == "all"].drop(columns="scope").T.to_string(header=False))
+    else:
+        stats = scan_duplicates(collection, start, end, window_minutes=window_minutes)
+        print_duplicate_summary(stats)
 
+        stats.per_key_frame().to_csv("duplicates_per_key.csv", index=False)
+        stats.per_day_frame().to_csv("duplicates_per_day.csv", index=False)
+        print("Saved duplicates_per_key.csv and duplicates_per_day.csv")
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+
+from pymongo import MongoClient
+from pymongo import monitoring
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+
+class ConnectionStats(monitoring.ConnectionPoolListener):
+    """
+    Connection-acquire timings for every cached client: how long getting a
+    client took (cache hit vs. new client) and how long each pool checkout took.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.client_acquires = {"hit": 0, "miss": 0, "miss_seconds": 0.0}
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.checkout_max_seconds = 0.0
+        self.checkout_failures = 0
+        self.connections_created = 0
+
+    def record_client_acquire(self, hit: bool, seconds: float):
+        with self._lock:
+            if hit:
+                self.client_acquires["hit"] += 1
+            else:
+                self.client_acquires["miss"] += 1
+                self.client_acquires["miss_seconds"] += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "client_acquires": dict(self.client_acquires),
+                "connections_created": self.connections_created,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_avg_ms": 1000 * self.checkout_seconds / self.checkouts if self.checkouts else 0.0,
+                "checkout_max_ms": 1000 * self.checkout_max_seconds,
+            }
+
+    # pymongo ConnectionPoolListener hooks
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None) or 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds += duration
+            self.checkout_max_seconds = max(self.checkout_max_seconds, duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+stats = ConnectionStats()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(uri: str = None, timeout_ms: int = 5000, max_pool_size: int = None,
+               min_pool_size: int = None) -> MongoClient:
+    """
+    Process-wide MongoClient per URI. The client is created lazily (no
+    handshake until the first operation) and then shared by every caller,
+    so scripts touching several collections pay TCP/TLS/auth once.
+    Pool sizes apply when the client for a URI is first created
+    (defaults: MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE or pymongo's).
+    """
+    uri = uri or os.getenv("MONGO_URI")
+    if not uri:
+        raise ValueError("MONGO_URI is not set")
+
+    start = time.perf_counter()
+    client = _clients.get(uri)
+    if client is not None:
+        stats.record_client_acquire(True, time.perf_counter() - start)
+        return client
+
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            max_pool_size = max_pool_size or int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+            min_pool_size = min_pool_size or int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+            client = MongoClient(
+                uri,
+                serverSelectionTimeoutMS=timeout_ms,
+                maxPoolSize=max_pool_size,
+                minPoolSize=min_pool_size,
+                connect=False,
+                event_listeners=[stats],
+            )
+            _clients[uri] = client
+            stats.record_client_acquire(False, time.perf_counter() - start)
+            logging.info("Mongo client created (maxPoolSize=%d)", max_pool_size)
+        else:
+            stats.record_client_acquire(True, time.perf_counter() - start)
+    return client
+
+
+def close_all():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+class MongoConnection:
+    def __init__(self, collections: str = None, timeout_ms: int = 5000, uri: str = None,
+                 db_name: str = None, max_pool_size: int = None, min_pool_size: int = None):
+        self.uri = uri or os.getenv("MONGO_URI")
+        self.timeout_ms = timeout_ms
+        self.db_name = db_name or os.getenv("DATABASE_NAME")
+        self.collections = collections
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.client = None
+
+    def connect(self) -> MongoClient:
+        if not self.uri:
+            raise ValueError("MONGO_URI is not set")
+        self.client = get_client(self.uri, self.timeout_ms, self.max_pool_size, self.min_pool_size)
+        return self.client
+
+    def ping(self):
+        """Fail fast if the server is unreachable (connect() itself is lazy)."""
+        (self.client or self.connect()).admin.command("ping")
+        logging.info("Mongo connected")
+
+    def get_db(self):
+        if not self.db_name or not self.collections:
+            raise ValueError("DATABASE_NAME or COLLECTIONS is not set")
+        self.db = (self.client or self.connect())[self.db_name]
+        self.collection = self.db[self.collections]
+        return self.db, self.collection
+
+    def get_collection(self, name: str):
+        """Any other collection in the same database, on the same pooled client."""
+        if not self.db_name:
+            raise ValueError("DATABASE_NAME is not set")
+        return (self.client or self.connect())[self.db_name][name]
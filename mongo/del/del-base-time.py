@@ -1,36 +1,15 @@
-import os
 import logging
+import os
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from mongo.connection import MongoConnection
+from mongo.retention import RetentionEngine, print_dry_run
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-class MongoConnection:
-    def __init__(self, timeout_ms: int = 5000):
-        self.uri = os.getenv("MONGO_URI")
-        self.timeout_ms = timeout_ms
-        self.db_name = os.getenv("DATABASE_NAME")
-        self.collections = "message_resource_messages"
-        
-    def connect(self) -> MongoClient:
-        if not self.uri:
-            raise ValueError("MONGO_URI is not set")
-        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=self.timeout_ms)
-        self.client.admin.command("ping")
-        logging.info("Mongo connected")
-        return self.client
-    
-    def get_db(self):
-        if not self.db_name or not self.collections:
-            raise ValueError("DATABASE_NAME or NOTIFICATION_COLLECTION is not set")
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.collections]
-        return self.db, self.collection
-    
 if __name__ == "__main__":
-    mongo = MongoConnection()
+    mongo = MongoConnection(collections="message_resource_messages")
     client = mongo.connect()
     db, collection = mongo.get_db()
     
@@ -38,20 +17,21 @@ if __name__ == "__main__":
     start_date = datetime(2025, 10, 6, 0, 0, 0, tzinfo=timezone.utc)
     end_date   = datetime(2025, 10, 15, 0, 0, 0, tzinfo=timezone.utc)
     
-    query = {
-        "createdTimestamp": {"$gte": start_date, "$lt": end_date}
-    }
-    
-    # preview first 5 docs
-    matches = list(collection.find(query).limit(5))
-    print("Preview of docs to be deleted:")
-    for m in matches:
-        print(m)
+    engine = RetentionEngine(
+        collection, "createdTimestamp", start_date, end_date,
+        batch_size=1000, docs_per_second=2000, concurrency=2,
+        checkpoint_path="del-base-time.checkpoint.json",
+        # building the index scans the whole collection; opt in explicitly
+        create_index=os.getenv("RETENTION_CREATE_INDEX") == "1",
+    )
+
+    # dry run: per-day counts of docs to be deleted
+    print_dry_run(engine)
     
-    # delete
+    # delete in throttled batches (resumes from the checkpoint if interrupted)
     confirm = input("Proceed with delete? (yes/no): ").strip().lower()
     if confirm == "yes":
-        result = collection.delete_many(query)
-        print(f"Deleted {result.deleted_count} documents")
+        deleted = engine.run()
+        print(f"Deleted {deleted} documents")
     else:
         print("Delete aborted")
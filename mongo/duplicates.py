@@ -0,0 +1,148 @@
+import logging
+from collections import deque
+from datetime import timedelta
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+
+# Sort prefix of the scan; matches the messages_duplicate_key_scan index shape
+KEY_FIELDS = ("organisationId", "farmId", "pondId", "gatewayId", "type")
+WATER_PARAMETER_PATH = "data.nodes.waterParameterClass.value"
+
+
+def duplicate_scan_pipeline(start=None, end=None) -> list:
+    """
+    Messages as compact (key, createdTimestamp) rows sorted by key then time.
+
+    waterParameterClass is not part of the sort so an index on
+    KEY_FIELDS + createdTimestamp can serve it; the detector keeps one window
+    per class inside each sorted key run instead.
+    """
+    time_cond = {"$ne": None}
+    if start is not None:
+        time_cond["$gte"] = start
+    if end is not None:
+        time_cond["$lt"] = end
+    project = {f: 1 for f in KEY_FIELDS}
+    project.update({"_id": 0, "createdTimestamp": 1, "wp": f"${WATER_PARAMETER_PATH}"})
+    return [
+        {"$match": {"createdTimestamp": time_cond}},
+        {"$sort": {**{f: 1 for f in KEY_FIELDS}, "createdTimestamp": 1}},
+        {"$project": project},
+    ]
+
+
+def message_key(doc: dict) -> tuple:
+    """(org, farm, pond, gateway, type, waterParameterClass), as in check_duplicate_info."""
+    org, farm, pond, gw, type_ = (doc.get(f) for f in KEY_FIELDS)
+    if "wp" in doc:
+        wp = doc["wp"]
+    else:
+        wp = doc.get("data", {}).get("nodes", {}).get("waterParameterClass", {}).get("value")
+    return (str(org), str(farm), str(pond), str(gw), type_, wp)
+
+
+class DuplicateStats:
+    """Running per-key and per-day counts of messages and duplicates."""
+
+    def __init__(self):
+        self.per_key = {}
+        self.per_day = {}
+
+    def add(self, key: tuple, ts, gap_minutes: float = None, in_window: int = 0):
+        k = self.per_key.get(key)
+        if k is None:
+            k = self.per_key[key] = {"messages": 0, "duplicates": 0, "pairs": 0,
+                                     "min_gap_minutes": None, "first": ts, "last": ts}
+        k["messages"] += 1
+        k["last"] = ts
+
+        day = ts.date().isoformat()
+        d = self.per_day.setdefault(day, {"messages": 0, "duplicates": 0, "pairs": 0})
+        d["messages"] += 1
+
+        if in_window:
+            for entry in (k, d):
+                entry["duplicates"] += 1
+                entry["pairs"] += in_window
+            if k["min_gap_minutes"] is None or gap_minutes < k["min_gap_minutes"]:
+                k["min_gap_minutes"] = gap_minutes
+
+    @property
+    def messages(self) -> int:
+        return sum(d["messages"] for d in self.per_day.values())
+
+    @property
+    def duplicates(self) -> int:
+        return sum(d["duplicates"] for d in self.per_day.values())
+
+    def per_key_frame(self) -> pd.DataFrame:
+        rows = [dict(zip(("organisationId", "farmId", "pondId", "gatewayId", "type", "waterParameterClass"), key), **v)
+                for key, v in self.per_key.items()]
+        df = pd.DataFrame(rows)
+        if not df.empty:
+            df = df.sort_values(["duplicates", "messages"], ascending=False, ignore_index=True)
+        return df
+
+    def per_day_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame([{"day": day, **v} for day, v in sorted(self.per_day.items())])
+        if not df.empty:
+            df["duplicate_ratio"] = df["duplicates"] / df["messages"]
+        return df
+
+
+def detect_duplicates(rows, window_minutes: float = 15, stats: DuplicateStats = None):
+    """
+    Yield (key, previous_ts, ts, gap_minutes, in_window) for every message that
+    follows another message with the same key by less than window_minutes.
+
+    `rows` must be sorted by KEY_FIELDS then createdTimestamp (the order of
+    duplicate_scan_pipeline). Each key keeps a deque of the timestamps still
+    inside the window, so the scan is O(n) however many messages a key has;
+    in_window is the number of earlier messages within the window (the number
+    of pairs the old pairwise check reported for this message).
+    """
+    window = timedelta(minutes=window_minutes)
+    run_prefix = None
+    windows = {}  # waterParameterClass -> deque of timestamps inside the window
+
+    for row in rows:
+        ts = row.get("createdTimestamp")
+        if not ts:
+            continue
+        key = message_key(row)
+        if key[:5] != run_prefix:
+            run_prefix = key[:5]
+            windows = {}
+
+        recent = windows.setdefault(key[5], deque())
+        while recent and ts - recent[0] >= window:
+            recent.popleft()
+
+        if recent:
+            prev = recent[-1]
+            gap = (ts - prev).total_seconds() / 60
+            if stats is not None:
+                stats.add(key, ts, gap, len(recent))
+            yield key, prev, ts, gap, len(recent)
+        elif stats is not None:
+            stats.add(key, ts)
+        recent.append(ts)
+
+
+def scan_duplicates(collection, start=None, end=None, window_minutes: float = 15,
+                    on_duplicate=None, batch_size: int = 10_000) -> DuplicateStats:
+    """
+    Stream message_resource_messages through detect_duplicates server-sorted,
+    keeping only the per-key and per-day summaries in memory.
+    `on_duplicate` receives every duplicate tuple (e.g. to print or save them).
+    """
+    stats = DuplicateStats()
+    cursor = collection.aggregate(duplicate_scan_pipeline(start, end), allowDiskUse=True, batchSize=batch_size)
+    for dup in detect_duplicates(cursor, window_minutes, stats):
+        if on_duplicate is not None:
+            on_duplicate(dup)
+    logging.info("Scanned %d messages, %d duplicates within %s minutes",
+                 stats.messages, stats.duplicates, window_minutes)
+    return stats
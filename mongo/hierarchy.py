@@ -0,0 +1,200 @@
+import logging
+import threading
+
+from bson import ObjectId
+
+logging.basicConfig(level=logging.INFO)
+
+# URL path segment -> hierarchy level; PARENT_FIELDS links each level to the one above
+URL_LEVELS = {
+    "organisations": "organisation",
+    "farms": "farm",
+    "ponds": "pond",
+    "cycles": "cycle",
+}
+PARENT_FIELDS = {"farm": "organisationId", "pond": "farmId", "cycle": "pondId"}
+
+
+def url_to_dict(url: str) -> dict:
+    parts = url.split("/")
+    dct = {}
+    for i in range(0, len(parts) - 1, 2):
+        dct[parts[i]] = parts[i + 1]
+    return dct
+
+
+def _oid_key(value):
+    """12-byte key for an ObjectId (or its hex string); None if it is not one."""
+    if isinstance(value, ObjectId):
+        return value.binary
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value).binary
+    return None
+
+
+class Node:
+    __slots__ = ("id", "parent", "name", "updated")
+
+    def __init__(self, id: bytes, parent: bytes, name, updated):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.updated = updated
+
+    @property
+    def object_id(self) -> ObjectId:
+        return ObjectId(self.id)
+
+    def __repr__(self):
+        return f"Node({self.object_id}, name={self.name!r})"
+
+
+class ResolvedUrl:
+    __slots__ = ("url", "organisation_id", "farm", "pond", "cycle", "file")
+
+    def __init__(self, url: str, organisation_id, farm, pond, cycle, file):
+        self.url = url
+        self.organisation_id = organisation_id
+        self.farm = farm
+        self.pond = pond
+        self.cycle = cycle
+        self.file = file
+
+    def to_dict(self) -> dict:
+        def node(n):
+            return None if n is None else {"_id": n.object_id, "name": n.name}
+        return {
+            "url": self.url,
+            "organisationId": self.organisation_id,
+            "farm": node(self.farm),
+            "pond": node(self.pond),
+            "cycle": node(self.cycle),
+            "file": self.file,
+        }
+
+
+class _Level:
+    """One collection of the hierarchy, kept as {12-byte id: Node}."""
+
+    def __init__(self, name: str, collection, name_field: str = "name",
+                 update_field: str = "updateTimestamp"):
+        self.name = name
+        self.collection = collection
+        self.parent_field = PARENT_FIELDS.get(name)
+        self.name_field = name_field
+        self.update_field = update_field
+        self.nodes = {}
+        self.missing = set()  # ids already looked up and not found, until the next refresh
+        self.high_water = None
+
+    def _projection(self) -> dict:
+        projection = {self.name_field: 1, self.update_field: 1}
+        if self.parent_field:
+            projection[self.parent_field] = 1
+        return projection
+
+    def _add(self, doc: dict):
+        key = _oid_key(doc["_id"])
+        if key is None:
+            return
+        updated = doc.get(self.update_field)
+        self.nodes[key] = Node(key, _oid_key(doc.get(self.parent_field)) if self.parent_field else None,
+                               doc.get(self.name_field), updated)
+        self.missing.discard(key)
+        if updated is not None and (self.high_water is None or updated > self.high_water):
+            self.high_water = updated
+
+    def load(self, query: dict = None) -> int:
+        n = 0
+        for doc in self.collection.find(query or {}, self._projection()).batch_size(10_000):
+            self._add(doc)
+            n += 1
+        return n
+
+    def refresh(self) -> int:
+        self.missing.clear()
+        if self.high_water is None:
+            return self.load()
+        # $gte: documents sharing the last timestamp may not all have been seen
+        return self.load({self.update_field: {"$gte": self.high_water}})
+
+    def fetch(self, keys: set) -> int:
+        """One batched $in for ids neither cached nor known to be missing."""
+        keys = [k for k in keys if k not in self.nodes and k not in self.missing]
+        if not keys:
+            return 0
+        n = self.load({"_id": {"$in": [ObjectId(k) for k in keys]}})
+        self.missing.update(k for k in keys if k not in self.nodes)
+        return n
+
+
+class HierarchyCache:
+    """
+    Preloaded farm -> pond -> cycle lookup for image URL paths
+    (organisations/<id>/farms/<id>/ponds/<id>/cycles/<id>/<file>).
+
+    Every level is a dict of 12-byte ObjectId keys to __slots__ nodes holding
+    only the parent id, name and update time. refresh() pulls only documents
+    whose updateTimestamp reached the last one seen; resolve_urls() sends
+    one $in per level for the ids still missing. Pond and cycle collections
+    are optional.
+    """
+
+    def __init__(self, farm_collection, pond_collection=None, cycle_collection=None,
+                 name_field: str = "name", update_field: str = "updateTimestamp"):
+        self.levels = {}
+        for name, collection in (("farm", farm_collection), ("pond", pond_collection), ("cycle", cycle_collection)):
+            if collection is not None:
+                self.levels[name] = _Level(name, collection, name_field, update_field)
+        self._lock = threading.Lock()
+
+    def preload(self) -> dict:
+        with self._lock:
+            counts = {name: level.load() for name, level in self.levels.items()}
+        logging.info("Hierarchy cache loaded: %s", counts)
+        return counts
+
+    def refresh(self) -> dict:
+        with self._lock:
+            counts = {name: level.refresh() for name, level in self.levels.items()}
+        logging.info("Hierarchy cache refreshed: %s", counts)
+        return counts
+
+    def get(self, level: str, object_id):
+        key = _oid_key(object_id)
+        return self.levels[level].nodes.get(key) if key is not None and level in self.levels else None
+
+    def resolve_urls(self, urls) -> list:
+        parsed = []
+        wanted = {name: set() for name in self.levels}
+        for url in urls:
+            keys = {}
+            for segment, value in url_to_dict(url).items():
+                level = URL_LEVELS.get(segment)
+                if level:
+                    keys[level] = _oid_key(value) or value
+            parsed.append((url, keys))
+            for name in self.levels:
+                if isinstance(keys.get(name), bytes):
+                    wanted[name].add(keys[name])
+
+        with self._lock:
+            for name, level in self.levels.items():
+                fetched = level.fetch(wanted[name])
+                if fetched:
+                    logging.info("Fetched %d uncached %s documents", fetched, name)
+
+        resolved = []
+        for url, keys in parsed:
+            nodes = {}
+            for name, level in self.levels.items():
+                key = keys.get(name)
+                nodes[name] = level.nodes.get(key) if isinstance(key, bytes) else None
+            org = keys.get("organisation")
+            resolved.append(ResolvedUrl(
+                url,
+                ObjectId(org) if isinstance(org, bytes) else org,
+                nodes.get("farm"), nodes.get("pond"), nodes.get("cycle"),
+                url.rsplit("/", 1)[-1],
+            ))
+        return resolved
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from mongo.connection import MongoConnection
+
+logging.basicConfig(level=logging.INFO)
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+# A shape is "slow" when it scans a collection, sorts in memory or examines
+# this many documents per document returned
+MAX_DOCS_EXAMINED_PER_RETURNED = 10
+
+SHAPES = {}
+
+
+def register_shape(name: str):
+    """
+    Register a query shape. The function gets the Database and returns
+    {"collection", "filter", and optionally "sort", "projection", "limit"}
+    with concrete sample values to explain.
+    """
+    def decorator(fn):
+        SHAPES[name] = fn
+        return fn
+    return decorator
+
+
+def _last_days(days: int):
+    end = datetime.now(timezone.utc)
+    return end - timedelta(days=days), end
+
+
+@register_shape("messages_by_created_timestamp")
+def _messages_by_created_timestamp(db):
+    start, end = _last_days(7)
+    return {
+        "collection": "message_resource_messages",
+        "filter": {"createdTimestamp": {"$gte": start, "$lt": end}},
+        "sort": [("createdTimestamp", -1)],
+    }
+
+
+@register_shape("messages_duplicate_key_scan")
+def _messages_duplicate_key_scan(db):
+    start, end = _last_days(1)
+    return {
+        "collection": "message_resource_messages",
+        "filter": {"createdTimestamp": {"$gte": start, "$lt": end}},
+        "sort": [("organisationId", 1), ("farmId", 1), ("pondId", 1), ("gatewayId", 1),
+                 ("type", 1), ("createdTimestamp", 1)],
+    }
+
+
+@register_shape("notifications_by_create_timestamp")
+def _notifications_by_create_timestamp(db):
+    start, end = _last_days(7)
+    return {
+        "collection": "notification_resource_notifications",
+        "filter": {"createTimestamp": {"$gte": start, "$lt": end}},
+    }
+
+
+@register_shape("notifications_first_by_type")
+def _notifications_first_by_type(db):
+    sample = db["notification_resource_notifications"].find_one({}, {"type": 1}) or {}
+    return {
+        "collection": "notification_resource_notifications",
+        "filter": {"type": sample.get("type", "TEST")},
+        "limit": 1,
+    }
+
+
+@register_shape("accounts_by_member_ids")
+def _accounts_by_member_ids(db):
+    org = db["organisation_resource_organisations"].find_one({}, {"memberIds": 1}) or {}
+    return {
+        "collection": "account_resource_accounts",
+        "filter": {"_id": {"$in": org.get("memberIds", [])}},
+        "projection": {"pushNotificationTokens": 1, "username": 1},
+    }
+
+
+@register_shape("sensor_measurements_by_sensor_and_time")
+def _sensor_measurements_by_sensor_and_time(db):
+    sample = db["sensor_resource_measurements"].find_one({}, {"sId": 1, "t": 1}) or {}
+    t = sample.get("t", datetime(2025, 4, 21, tzinfo=timezone.utc))
+    return {
+        "collection": "sensor_resource_measurements",
+        "filter": {"sId": sample.get("sId", ObjectId("67b3039d85c10e3ee466eccd")),
+                   "t": {"$gte": t - timedelta(days=1), "$lte": t}},
+    }
+
+
+def _plan_stages(plan: dict, stages: list, indexes: list):
+    if not plan:
+        return
+    stages.append(plan.get("stage"))
+    if plan.get("indexName"):
+        indexes.append(plan["indexName"])
+    for child_key in ("inputStage", "innerStage", "outerStage"):
+        _plan_stages(plan.get(child_key), stages, indexes)
+    for child in plan.get("inputStages", []):
+        _plan_stages(child, stages, indexes)
+
+
+def explain_shape(db, spec: dict) -> dict:
+    command = {"find": spec["collection"], "filter": spec["filter"]}
+    if spec.get("sort"):
+        command["sort"] = dict(spec["sort"])
+    if spec.get("projection"):
+        command["projection"] = spec["projection"]
+    if spec.get("limit"):
+        command["limit"] = spec["limit"]
+
+    started = time.perf_counter()
+    explain = db.command({"explain": command, "verbosity": "executionStats"})
+    latency_ms = 1000 * (time.perf_counter() - started)
+
+    planner = explain.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    # Newer servers wrap the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+    stages, indexes = [], []
+    _plan_stages(winning, stages, indexes)
+
+    exec_stats = explain.get("executionStats", {})
+    returned = exec_stats.get("nReturned", 0)
+    docs_examined = exec_stats.get("totalDocsExamined", 0)
+    return {
+        "stages": stages,
+        "indexes_used": sorted(set(indexes)),
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "n_returned": returned,
+        "docs_examined": docs_examined,
+        "keys_examined": exec_stats.get("totalKeysExamined", 0),
+        "docs_examined_per_returned": round(docs_examined / max(returned, 1), 3),
+        "execution_ms": exec_stats.get("executionTimeMillis", 0),
+        "latency_ms": round(latency_ms, 3),
+    }
+
+
+def propose_index(spec: dict) -> list:
+    """Compound index following the Equality, Sort, Range rule."""
+    equality, ranges = [], []
+    for field, cond in spec["filter"].items():
+        if field.startswith("$"):
+            continue
+        if isinstance(cond, dict) and any(op in RANGE_OPERATORS for op in cond):
+            ranges.append(field)
+        else:
+            # plain values, $eq and $in all act as equality matches
+            equality.append(field)
+
+    keys = [(f, 1) for f in equality]
+    for field, direction in spec.get("sort") or []:
+        if field not in equality:
+            keys.append((field, direction))
+    for field in ranges:
+        if field not in dict(keys):
+            keys.append((field, 1))
+    return keys
+
+
+def _index_covers(existing: dict, keys: list) -> bool:
+    """True when an existing index has `keys` as a prefix (directions may all be flipped)."""
+    flipped = [(f, -d) for f, d in keys]
+    for info in existing.values():
+        prefix = [(f, int(d)) for f, d in info["key"]][:len(keys)]
+        if prefix in (keys, flipped):
+            return True
+    return False
+
+
+def profile_shapes(db, names: list = None) -> dict:
+    report = {"database": db.name, "generated_at": datetime.now(timezone.utc).isoformat(), "shapes": {}}
+    for name in sorted(names or SHAPES):
+        spec = SHAPES[name](db)
+        entry = {"collection": spec["collection"], "filter_fields": sorted(spec["filter"])}
+        try:
+            entry.update(explain_shape(db, spec))
+        except Exception as e:
+            logging.warning("Explain failed for %s: %s", name, e)
+            entry["error"] = str(e)
+            report["shapes"][name] = entry
+            continue
+
+        slow = (entry["collscan"] or entry["in_memory_sort"]
+                or entry["docs_examined_per_returned"] > MAX_DOCS_EXAMINED_PER_RETURNED)
+        entry["status"] = "slow" if slow else "ok"
+
+        if slow:
+            keys = propose_index(spec)
+            existing = db[spec["collection"]].index_information()
+            if keys and not _index_covers(existing, keys):
+                entry["proposed_index"] = [[f, d] for f, d in keys]
+                entry["create_index"] = f"db.{spec['collection']}.createIndex({json.dumps(dict(keys))})"
+        report["shapes"][name] = entry
+    return report
+
+
+if __name__ == "__main__":
+    mongo = MongoConnection(collections="message_resource_messages")
+    db, _ = mongo.get_db()
+
+    report = profile_shapes(db)
+
+    output_path = os.getenv("INDEX_REPORT_PATH", "index_report.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True, default=str)
+
+    for name, entry in report["shapes"].items():
+        status = entry.get("status", "error")
+        print(f"{'✅' if status == 'ok' else '⚠️'} {name}: {status} "
+              f"(stages={entry.get('stages')}, examined/returned={entry.get('docs_examined_per_returned')})")
+        if entry.get("create_index"):
+            print(f"   → {entry['create_index']}")
+    print(f"Report saved to {output_path}")
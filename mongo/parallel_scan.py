@@ -0,0 +1,176 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from bson import ObjectId
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _field_bound(collection, query: dict, field: str, direction: int):
+    doc = collection.find_one(query, {field: 1}, sort=[(field, direction)])
+    return doc.get(field) if doc else None
+
+
+def time_split_points(collection, query: dict = None, n_partitions: int = 8, field: str = "_id") -> list:
+    """
+    Boundaries that cut [min, max] of an ObjectId or datetime field into equal time ranges.
+    Cheap (two indexed lookups) but uneven when inserts are bursty.
+    """
+    query = query or {}
+    lo = _field_bound(collection, query, field, 1)
+    hi = _field_bound(collection, query, field, -1)
+    if lo is None or hi is None:
+        return []
+
+    lo_time = lo.generation_time if isinstance(lo, ObjectId) else lo
+    hi_time = hi.generation_time if isinstance(hi, ObjectId) else hi
+    step = (hi_time - lo_time) / n_partitions
+
+    points = []
+    for i in range(1, n_partitions):
+        t = lo_time + step * i
+        points.append(ObjectId.from_datetime(t) if isinstance(lo, ObjectId) else t)
+    return sorted(set(points))
+
+
+def sample_split_points(collection, query: dict = None, n_partitions: int = 8,
+                        field: str = "_id", sample_size: int = 1000) -> list:
+    """Boundaries at the quantiles of a $sample of the field (even partitions for any field type)."""
+    pipeline = []
+    if query:
+        pipeline.append({"$match": query})
+    pipeline += [{"$sample": {"size": sample_size}}, {"$project": {field: 1}}]
+    values = sorted(doc[field] for doc in collection.aggregate(pipeline) if doc.get(field) is not None)
+    if not values:
+        return []
+    step = len(values) / n_partitions
+    return sorted({values[int(step * i)] for i in range(1, n_partitions)})
+
+
+def range_queries(query: dict, field: str, split_points: list) -> list:
+    """One query per [lower, upper) range; the first and last ranges are open-ended."""
+    bounds = [None] + list(split_points) + [None]
+    queries = []
+    for lower, upper in zip(bounds[:-1], bounds[1:]):
+        cond = {}
+        if lower is not None:
+            cond["$gte"] = lower
+        if upper is not None:
+            cond["$lt"] = upper
+        part = {field: cond} if cond else {}
+        if query and part:
+            queries.append({"$and": [query, part]})
+        else:
+            queries.append(query or part)
+    return queries
+
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once the consumer has gone away."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_range(collection, query: dict, projection, field: str, batch_size: int, transform,
+                out: queue.Queue, stop: threading.Event):
+    """Stream one range into `out` as ("batch", docs) items, then ("done", None) or ("error", exc)."""
+    try:
+        cursor = collection.find(query, projection).sort(field, 1).batch_size(batch_size)
+        batch = []
+        for doc in cursor:
+            batch.append(doc if transform is None else transform(doc))
+            if len(batch) >= batch_size:
+                if not _put(out, ("batch", batch), stop):
+                    return
+                batch = []
+        if batch and not _put(out, ("batch", batch), stop):
+            return
+    except Exception as e:
+        _put(out, ("error", e), stop)
+        return
+    _put(out, ("done", None), stop)
+
+
+def parallel_scan(collection, query: dict = None, projection: dict = None, field: str = "_id",
+                  n_partitions: int = 16, max_workers: int = 8, batch_size: int = 5000,
+                  split: str = "time", transform=None, queue_batches: int = 2):
+    """
+    Scan a collection in concurrent ranges of `field` and yield documents in `field` order.
+
+    All ranges share the collection's MongoClient (and its connection pool).
+    At most max_workers ranges are in flight, and each streams its documents
+    through a queue of at most queue_batches batches of batch_size, so memory
+    stays at about max_workers * (queue_batches + 1) * batch_size documents
+    however large the ranges are. `transform` runs in the worker thread, so
+    turning docs into compact rows there keeps memory down.
+    """
+    query = query or {}
+    if split == "sample":
+        points = sample_split_points(collection, query, n_partitions, field)
+    elif split == "time":
+        points = time_split_points(collection, query, n_partitions, field)
+    else:
+        raise ValueError(f"Unknown split method: {split}")
+    queries = range_queries(query, field, points)
+    logging.info("Scanning %s in %d ranges with %d workers", collection.name, len(queries), max_workers)
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def submit(q):
+            out = queue.Queue(maxsize=queue_batches)
+            pool.submit(_scan_range, collection, q, projection, field, batch_size, transform, out, stop)
+            return out
+
+        try:
+            remaining = iter(queries)
+            pending = deque(submit(q) for q in islice(remaining, max_workers))
+            while pending:
+                # Ranges are consumed in order, which keeps the output sorted;
+                # later ranges wait on their full queues meanwhile
+                out = pending[0]
+                while True:
+                    kind, item = out.get()
+                    if kind == "done":
+                        break
+                    if kind == "error":
+                        raise item
+                    yield from item
+                pending.popleft()
+                next_query = next(remaining, None)
+                if next_query is not None:
+                    pending.append(submit(next_query))
+        finally:
+            # Also when the caller stops early: blocked workers give up
+            stop.set()
+
+
+def parallel_count(collection, query: dict = None, field: str = "_id",
+                   n_partitions: int = 16, max_workers: int = 8) -> int:
+    query = query or {}
+    queries = range_queries(query, field, time_split_points(collection, query, n_partitions, field))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return sum(pool.map(collection.count_documents, queries))
+
+
+if __name__ == "__main__":
+    from mongo.connection import MongoConnection
+
+    mongo = MongoConnection(collections=os.getenv("COLLECTIONS"))
+    client = mongo.connect()
+    db, collection = mongo.get_db()
+
+    start = datetime.now()
+    total = sum(1 for _ in parallel_scan(collection, projection={"_id": 1}))
+    print(f"Scanned {total} documents in {(datetime.now() - start).total_seconds():.3f} seconds")
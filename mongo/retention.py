@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, NotPrimaryError
+from pymongo.write_concern import WriteConcern
+
+logging.basicConfig(level=logging.INFO)
+
+
+class RateBudget:
+    """
+    Docs-per-second token bucket with AIMD adjustment: the rate is cut in half
+    when a delete is slower than the latency target and grows back by 10%
+    while deletes stay fast, never above the configured maximum.
+    """
+
+    def __init__(self, max_docs_per_second: float, target_latency_ms: float, min_docs_per_second: float = 50):
+        self.max_rate = float(max_docs_per_second)
+        self.min_rate = min(float(min_docs_per_second), self.max_rate)
+        self.rate = self.max_rate
+        self.target_latency = target_latency_ms / 1000.0
+        self._next_free = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n_docs: int):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + n_docs / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def observe(self, latency_s: float):
+        with self._lock:
+            if latency_s > self.target_latency:
+                self.rate = max(self.min_rate, self.rate / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+class RetentionEngine:
+    """
+    Delete every document with start <= time_field < end in bounded _id batches,
+    oldest first, within a docs-per-second budget.
+
+    Batches are read in (time_field, _id) order and deleted by _id with
+    majority write concern, so delete latency includes replication and the
+    budget backs off when secondaries fall behind. After each batch (in order)
+    the position is checkpointed to a JSON file; a killed run resumes from it.
+
+    The batch query needs an index on {time_field: 1, _id: 1}. By default run()
+    refuses to start without it and logs the createIndex command to run off-peak;
+    create_index=True builds it instead (a full collection scan on the primary).
+    """
+
+    def __init__(self, collection, time_field: str, start: datetime, end: datetime,
+                 batch_size: int = 1000, docs_per_second: float = 2000, concurrency: int = 2,
+                 target_latency_ms: float = 250, checkpoint_path: str = None, majority: bool = True,
+                 create_index: bool = False):
+        self.collection = collection
+        self.time_field = time_field
+        self.start = start
+        self.end = end
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.budget = RateBudget(docs_per_second, target_latency_ms)
+        self.checkpoint_path = checkpoint_path
+        self.create_index = create_index
+        self.writer = collection.with_options(write_concern=WriteConcern(w="majority")) if majority else collection
+
+    # -- queries -----------------------------------------------------------
+
+    def range_query(self) -> dict:
+        return {self.time_field: {"$gte": self.start, "$lt": self.end}}
+
+    def _after(self, position) -> dict:
+        query = self.range_query()
+        if position is None:
+            return query
+        t, oid = position
+        return {"$and": [query, {"$or": [
+            {self.time_field: {"$gt": t}},
+            {self.time_field: t, "_id": {"$gt": oid}},
+        ]}]}
+
+    def ensure_index(self):
+        """Make sure {time_field: 1, _id: 1} exists, so batches are index scans, not sorts."""
+        keys = [(self.time_field, 1), ("_id", 1)]
+        for info in self.collection.index_information().values():
+            if list(info["key"])[:2] == keys:
+                return
+        if not self.create_index:
+            command = f"db.{self.collection.name}.createIndex({json.dumps(dict(keys))})"
+            logging.error("Missing index on %s; create it off-peak with: %s", self.collection.name, command)
+            raise RuntimeError(f"Missing index on {self.collection.name}: {command}")
+        logging.info("Creating index %s on %s", keys, self.collection.name)
+        self.collection.create_index(keys)
+
+    def dry_run(self) -> list:
+        """Per-day counts of what would be deleted, from one aggregation."""
+        pipeline = [
+            {"$match": self.range_query()},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${self.time_field}"}},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
+        return [{"day": doc["_id"], "count": doc["count"]} for doc in self.collection.aggregate(pipeline)]
+
+    def _fetch_batch(self, position):
+        cursor = (
+            self.collection.find(self._after(position), {"_id": 1, self.time_field: 1})
+            .sort([(self.time_field, 1), ("_id", 1)])
+            .limit(self.batch_size)
+        )
+        docs = list(cursor)
+        if not docs:
+            return [], position
+        last = docs[-1]
+        return [d["_id"] for d in docs], (last[self.time_field], last["_id"])
+
+    def _delete(self, ids: list, retries: int = 5) -> int:
+        delay = 1.0
+        for attempt in range(retries):
+            started = time.monotonic()
+            try:
+                result = self.writer.delete_many({"_id": {"$in": ids}})
+            except (AutoReconnect, NotPrimaryError) as e:
+                logging.warning("Delete failed (%s), retrying in %.1fs", e, delay)
+                self.budget.observe(float("inf"))
+                time.sleep(delay)
+                delay *= 2
+                continue
+            self.budget.observe(time.monotonic() - started)
+            return result.deleted_count
+        raise RuntimeError(f"Delete batch failed after {retries} attempts")
+
+    # -- checkpoint --------------------------------------------------------
+
+    def _checkpoint_key(self) -> dict:
+        return {
+            "collection": self.collection.full_name,
+            "time_field": self.time_field,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+        }
+
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None, 0
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("key") != self._checkpoint_key():
+            logging.warning("Checkpoint %s is for a different run, ignoring it", self.checkpoint_path)
+            return None, 0
+        position = data.get("position")
+        if position:
+            position = (datetime.fromisoformat(position["time"]), ObjectId(position["id"]))
+        return position, data.get("deleted", 0)
+
+    def save_checkpoint(self, position, deleted: int, done: bool = False):
+        if not self.checkpoint_path:
+            return
+        data = {
+            "key": self._checkpoint_key(),
+            "position": {"time": position[0].isoformat(), "id": str(position[1])} if position else None,
+            "deleted": deleted,
+            "done": done,
+            "saved_at": datetime.now().isoformat(),
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # -- run ---------------------------------------------------------------
+
+    def run(self, progress_every: int = 100_000) -> int:
+        self.ensure_index()
+        position, deleted = self.load_checkpoint()
+        if position is not None:
+            logging.info("Resuming after %s (%d already deleted)", position[0], deleted)
+
+        next_report = deleted + progress_every
+        pending = deque()  # (future, position after that batch), in fetch order
+        failed = False
+
+        def complete_oldest():
+            nonlocal deleted, next_report, failed
+            future, batch_position = pending.popleft()
+            try:
+                deleted += future.result()
+            except BaseException:
+                failed = True
+                raise
+            # Checkpoint only once every earlier batch has finished too
+            self.save_checkpoint(batch_position, deleted)
+            if deleted >= next_report:
+                logging.info("Deleted %d documents (rate %.0f docs/s)", deleted, self.budget.rate)
+                next_report += progress_every
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            try:
+                while True:
+                    ids, position = self._fetch_batch(position)
+                    if not ids:
+                        break
+                    self.budget.acquire(len(ids))
+                    pending.append((pool.submit(self._delete, ids), position))
+                    while pending and (pending[0][0].done() or len(pending) >= self.concurrency):
+                        complete_oldest()
+            finally:
+                try:
+                    # Also on interrupt: batches already sent still finish and get checkpointed
+                    while pending and not failed:
+                        complete_oldest()
+                finally:
+                    # After a failed batch the checkpoint stays before it, so a resume
+                    # retries it; later batches are cancelled or finish unrecorded
+                    for future, _ in pending:
+                        future.cancel()
+
+        self.save_checkpoint(position, deleted, done=True)
+        logging.info("Retention run finished: %d documents deleted", deleted)
+        return deleted
+
+
+def print_dry_run(engine: RetentionEngine):
+    days = engine.dry_run()
+    total = sum(d["count"] for d in days)
+    print(f"Matched {total} documents in {engine.collection.name}")
+    for d in days:
+        print(f"  {d['day']}: {d['count']}")
+    return total
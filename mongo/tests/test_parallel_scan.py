@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+# Run against an in-memory mongomock collection instead of a live cluster
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from mongo.parallel_scan import parallel_scan, range_queries, sample_split_points, time_split_points
+
+N_DOCS = 2000
+
+
+@pytest.fixture
+def collection():
+    coll = mongomock.MongoClient().db.measurements
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    coll.insert_many([
+        {"_id": ObjectId.from_datetime(base + timedelta(minutes=i)), "v": i, "t": base + timedelta(minutes=i)}
+        for i in range(N_DOCS)
+    ])
+    return coll
+
+
+def _range_counts(collection, field, points):
+    return [collection.count_documents(q) for q in range_queries({}, field, points)]
+
+
+def test_time_split_points_cover_every_document_once(collection):
+    points = time_split_points(collection, n_partitions=8)
+    assert len(points) == 7
+    assert points == sorted(points)
+    counts = _range_counts(collection, "_id", points)
+    assert sum(counts) == N_DOCS
+    # Inserts are evenly spread in time, so the ranges are even too
+    assert max(counts) - min(counts) <= 2
+
+
+def test_time_split_points_on_datetime_field(collection):
+    points = time_split_points(collection, n_partitions=4, field="t")
+    assert all(isinstance(p, datetime) for p in points)
+    assert sum(_range_counts(collection, "t", points)) == N_DOCS
+
+
+def test_sample_split_points_cover_every_document_once(collection):
+    points = sample_split_points(collection, n_partitions=8, field="v", sample_size=500)
+    assert 0 < len(points) <= 7
+    assert points == sorted(points)
+    assert sum(_range_counts(collection, "v", points)) == N_DOCS
+
+
+def test_split_points_of_an_empty_collection():
+    coll = mongomock.MongoClient().db.empty
+    assert time_split_points(coll) == []
+    assert sample_split_points(coll) == []
+
+
+@pytest.mark.parametrize("split, field", [("time", "_id"), ("sample", "v")])
+def test_parallel_scan_yields_every_document_in_order(collection, split, field):
+    # Small batches and single-batch queues force workers to block on the bounded queues
+    docs = list(parallel_scan(collection, field=field, split=split, n_partitions=10,
+                              max_workers=3, batch_size=7, queue_batches=1))
+    values = [d[field] for d in docs]
+    assert len(values) == N_DOCS
+    assert values == sorted(values)
+
+
+def test_parallel_scan_applies_transform_and_query(collection):
+    rows = list(parallel_scan(collection, query={"v": {"$gte": 1500}}, transform=lambda d: d["v"],
+                              n_partitions=4, max_workers=2, batch_size=50))
+    assert rows == list(range(1500, N_DOCS))
+
+
+def test_parallel_scan_stops_workers_when_closed_early(collection):
+    before = threading.active_count()
+    scan = parallel_scan(collection, n_partitions=8, max_workers=4, batch_size=10, queue_batches=1)
+    assert len(list(islice(scan, 25))) == 25
+    scan.close()
+
+    deadline = time.monotonic() + 5
+    while threading.active_count() > before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() <= before
+
+
+def test_parallel_scan_rejects_unknown_split(collection):
+    with pytest.raises(ValueError):
+        list(parallel_scan(collection, split="hash"))
@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+# Run against an in-memory mongomock collection instead of a live cluster
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from mongo.retention import RateBudget, RetentionEngine
+
+BASE = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def collection():
+    coll = mongomock.MongoClient().db.messages
+    # 100 documents inside the first day, 20 after it
+    coll.insert_many([{"createdTimestamp": BASE + timedelta(minutes=i)} for i in range(100)])
+    coll.insert_many([{"createdTimestamp": BASE + timedelta(days=2, minutes=i)} for i in range(20)])
+    return coll
+
+
+def _engine(collection, checkpoint_path, **kwargs):
+    options = dict(batch_size=10, docs_per_second=1e6, concurrency=1, target_latency_ms=10_000,
+                   checkpoint_path=str(checkpoint_path), majority=False, create_index=True)
+    options.update(kwargs)
+    return RetentionEngine(collection, "createdTimestamp", BASE, BASE + timedelta(days=1), **options)
+
+
+def test_budget_halves_on_slow_deletes_and_recovers():
+    budget = RateBudget(1000, target_latency_ms=100, min_docs_per_second=100)
+    budget.observe(0.5)
+    assert budget.rate == 500
+    for _ in range(10):
+        budget.observe(0.5)
+    assert budget.rate == 100
+
+    budget.observe(0.01)
+    assert budget.rate == pytest.approx(110)
+    for _ in range(100):
+        budget.observe(0.01)
+    assert budget.rate == 1000
+
+
+def test_budget_spaces_out_acquires():
+    budget = RateBudget(1000, target_latency_ms=100)
+    started = time.monotonic()
+    budget.acquire(100)
+    budget.acquire(100)
+    assert time.monotonic() - started >= 0.09
+
+
+def test_missing_index_stops_the_run(collection, tmp_path):
+    engine = _engine(collection, tmp_path / "checkpoint.json", create_index=False)
+    with pytest.raises(RuntimeError, match="createIndex"):
+        engine.run()
+    assert collection.count_documents({}) == 120
+
+
+def test_run_deletes_only_the_range(collection, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    assert _engine(collection, checkpoint_path, concurrency=3).run() == 100
+    assert collection.count_documents({}) == 20
+
+    checkpoint = json.loads(checkpoint_path.read_text())
+    assert checkpoint["done"] and checkpoint["deleted"] == 100
+
+
+def test_failed_batch_keeps_checkpoint_before_it(collection, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    engine = _engine(collection, checkpoint_path)
+    delete = engine._delete
+    calls = []
+
+    def fail_third_batch(ids):
+        calls.append(ids)
+        if len(calls) == 3:
+            raise RuntimeError("delete failed")
+        return delete(ids)
+
+    engine._delete = fail_third_batch
+    with pytest.raises(RuntimeError, match="delete failed"):
+        engine.run()
+
+    checkpoint = json.loads(checkpoint_path.read_text())
+    assert checkpoint["deleted"] == 20 and not checkpoint["done"]
+    assert collection.count_documents({}) == 100
+
+    # A new run resumes after the last checkpointed batch and retries the failed one
+    resumed = _engine(collection, checkpoint_path)
+    assert resumed.load_checkpoint()[1] == 20
+    assert resumed.run() == 100
+    assert collection.count_documents({}) == 20
+
+
+def test_checkpoint_of_another_range_is_ignored(collection, tmp_path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    _engine(collection, checkpoint_path).save_checkpoint((BASE, ObjectId()), 50)
+    other = RetentionEngine(collection, "createdTimestamp", BASE, BASE + timedelta(hours=1),
+                            checkpoint_path=str(checkpoint_path), majority=False)
+    assert other.load_checkpoint() == (None, 0)
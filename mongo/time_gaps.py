@@ -0,0 +1,153 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from mongo.duplicates import KEY_FIELDS, WATER_PARAMETER_PATH
+
+logging.basicConfig(level=logging.INFO)
+
+GROUP_FIELDS = list(KEY_FIELDS) + ["waterParameterClass"]
+# Histogram edges in minutes; the last bin is open-ended
+GAP_BINS_MINUTES = [0, 1, 5, 10, 15, 30, 60, 120, 360, 1440]
+PERCENTILES = [5, 50, 90, 99]
+
+
+def load_timestamps(collection, start=None, end=None, group_fields: list = None,
+                    chunk_rows: int = 200_000, batch_size: int = 10_000) -> pa.Table:
+    """
+    createdTimestamp (timestamp[ms]) plus the grouping keys (strings) as an
+    Arrow table. Documents are turned into column chunks as the cursor
+    streams, so no per-document dicts are kept around.
+    """
+    group_fields = GROUP_FIELDS if group_fields is None else group_fields
+    time_cond = {"$ne": None}
+    if start is not None:
+        time_cond["$gte"] = start
+    if end is not None:
+        time_cond["$lt"] = end
+    project = {"_id": 0, "createdTimestamp": 1}
+    for f in group_fields:
+        project[f] = f"${WATER_PARAMETER_PATH}" if f == "waterParameterClass" else 1
+    cursor = collection.aggregate([{"$match": {"createdTimestamp": time_cond}}, {"$project": project}],
+                                  allowDiskUse=True, batchSize=batch_size)
+
+    schema = pa.schema([("createdTimestamp", pa.timestamp("ms"))] + [(f, pa.string()) for f in group_fields])
+    chunks = []
+    columns = {name: [] for name in schema.names}
+
+    def flush():
+        if columns["createdTimestamp"]:
+            chunks.append(pa.table(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+
+    for doc in cursor:
+        columns["createdTimestamp"].append(doc["createdTimestamp"])
+        for f in group_fields:
+            value = doc.get(f)
+            columns[f].append(None if value is None else str(value))
+        if len(columns["createdTimestamp"]) >= chunk_rows:
+            flush()
+    flush()
+
+    table = pa.concat_tables(chunks) if chunks else schema.empty_table()
+    logging.info("Loaded %d timestamps from %s", table.num_rows, collection.name)
+    return table
+
+
+def group_codes(table: pa.Table, group_fields: list):
+    """Dense group code per row and the key values of each code (in code order)."""
+    if not group_fields:
+        return np.zeros(table.num_rows, dtype=np.int64), pd.DataFrame(index=range(min(table.num_rows, 1)))
+    keys = table.select(group_fields).to_pandas()
+    codes = keys.groupby(group_fields, dropna=False, sort=False).ngroup().to_numpy()
+    _, first_rows = np.unique(codes, return_index=True)
+    return codes, keys.iloc[first_rows].reset_index(drop=True)
+
+
+def gap_summary(table: pa.Table, group_fields: list = None, threshold_minutes: float = 15,
+                bins: list = None, percentiles: list = None) -> pd.DataFrame:
+    """
+    Per-group statistics of the gaps between consecutive createdTimestamps.
+
+    Rows are sorted once by (group, time) and every gap comes from a single
+    np.diff over datetime64[ms]; gaps that cross a group boundary are masked
+    out. Percentiles (nearest rank), histogram counts and the share of gaps
+    below threshold_minutes are then computed for all groups at once.
+    """
+    group_fields = GROUP_FIELDS if group_fields is None else group_fields
+    bins = GAP_BINS_MINUTES if bins is None else bins
+    percentiles = PERCENTILES if percentiles is None else percentiles
+
+    ts = table.column("createdTimestamp").to_numpy().astype("datetime64[ms]")
+    codes, keys = group_codes(table, group_fields)
+    n_groups = len(keys)
+
+    order = np.lexsort((ts, codes))
+    ts, codes = ts[order], codes[order]
+    same_group = codes[1:] == codes[:-1]
+    gaps = (np.diff(ts).astype(np.int64) / 60_000.0)[same_group]
+    gap_codes = codes[1:][same_group]
+
+    n_messages = np.bincount(codes, minlength=n_groups)
+    n_gaps = np.bincount(gap_codes, minlength=n_groups)
+    summary = keys.copy()
+    summary["messages"] = n_messages
+    summary["gaps"] = n_gaps
+    starts = np.cumsum(n_messages) - n_messages
+    summary["first"] = ts[starts] if len(ts) else np.datetime64("NaT", "ms")
+    summary["last"] = ts[starts + n_messages - 1] if len(ts) else np.datetime64("NaT", "ms")
+
+    # Sort gaps within each group so group-relative ranks give percentiles
+    gap_order = np.lexsort((gaps, gap_codes))
+    gaps_sorted, codes_sorted = gaps[gap_order], gap_codes[gap_order]
+    offsets = np.r_[0, np.cumsum(n_gaps)[:-1]]
+    has_gaps = n_gaps > 0
+
+    def at_rank(fraction):
+        out = np.full(n_groups, np.nan)
+        idx = offsets + np.floor(fraction * (n_gaps - 1)).astype(np.int64)
+        out[has_gaps] = gaps_sorted[idx[has_gaps]]
+        return out
+
+    summary["min_gap_minutes"] = at_rank(0.0)
+    for p in percentiles:
+        summary[f"p{p}_gap_minutes"] = at_rank(p / 100)
+    summary["max_gap_minutes"] = at_rank(1.0)
+    mean = np.full(n_groups, np.nan)
+    mean[has_gaps] = np.bincount(codes_sorted, weights=gaps_sorted, minlength=n_groups)[has_gaps] / n_gaps[has_gaps]
+    summary["mean_gap_minutes"] = mean
+
+    below = np.bincount(gap_codes[gaps < threshold_minutes], minlength=n_groups)
+    summary["gaps_below_threshold"] = below
+    summary["share_below_threshold"] = np.where(has_gaps, below / np.maximum(n_gaps, 1), np.nan)
+
+    edges = np.asarray(bins, dtype=float)
+    bin_idx = np.searchsorted(edges, gaps, side="right") - 1
+    hist = np.bincount(gap_codes * len(edges) + bin_idx, minlength=n_groups * len(edges)).reshape(n_groups, len(edges))
+    for i, lo in enumerate(edges):
+        hi = f"{edges[i + 1]:g}" if i + 1 < len(edges) else "inf"
+        summary[f"hist_{lo:g}_{hi}"] = hist[:, i]
+    return summary
+
+
+def write_gap_summary(table: pa.Table, path: str, group_fields: list = None,
+                      threshold_minutes: float = 15) -> pd.DataFrame:
+    """
+    One Parquet file with an overall row (scope="all") followed by one row per
+    group (scope="group"), ready for dashboards.
+    """
+    group_fields = GROUP_FIELDS if group_fields is None else group_fields
+    overall = gap_summary(table, [], threshold_minutes)
+    per_group = gap_summary(table, group_fields, threshold_minutes)
+    overall.insert(0, "scope", "all")
+    per_group.insert(0, "scope", "group")
+    summary = pd.concat([overall, per_group], ignore_index=True)
+    summary["threshold_minutes"] = threshold_minutes
+
+    pq.write_table(pa.Table.from_pandas(summary, preserve_index=False), path, compression="zstd")
+    logging.info("Saved gap summary (%d groups) to %s", len(per_group), path)
+    return summary
@@ -3,49 +3,116 @@ from dotenv import load_dotenv
 import logging
 from bson import json_util
 
-from pymongo import MongoClient
+from mongo.connection import MongoConnection
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 
-class MongoConnection:
-    def __init__(self, timeout_ms: int = 5000):
-        self.uri = os.getenv("MONGO_URI")
-        self.timeout_ms = timeout_ms
-        self.db_name = os.getenv("DATABASE_NAME")
-        self.collections = os.getenv("COLLECTIONS")
-        
-    def connect(self) -> MongoClient:
-        if not self.uri:
-            raise ValueError("MONGO_URI is not set")
-        self.client = MongoClient(self.uri, serverSelectionTimeoutMS=self.timeout_ms)
-        self.client.admin.command("ping")
-        logging.info("Mongo connected")
-        return self.client
-    
-    def get_db(self):
-        if not self.db_name or not self.collections:
-            raise ValueError("DATABASE_NAME or COLLECTIONS is not set")
-        self.db = self.client[self.db_name]
-        self.collection = self.db[self.collections]
-        return self.db, self.collection
-    
-    
-if __name__ == "__main__":
-    mongo = MongoConnection()
-    client = mongo.connect()
-    db, collection = mongo.get_db()
 
-    types = collection.distinct("type")
-    logging.info("All notification types: %s", types)
+def first_per_type_pipeline(with_stats: bool = False) -> list:
+    """
+    One aggregation for the first document of every notification type.
+
+    Both modes sort on (type, _id), so they pick the same (oldest) document.
+    Without stats this is exactly $sort + $group/$first, which the server can
+    answer with a DISTINCT_SCAN over an index on {type: 1, _id: 1}. With stats it also
+    returns per-type counts, the status distribution (FAILED/SENT/...) and the
+    createTimestamp range, still in a single pass over the collection.
+    """
+    if not with_stats:
+        return [
+            {"$sort": {"type": 1, "_id": 1}},
+            {"$group": {"_id": "$type", "doc": {"$first": "$$ROOT"}}},
+            {"$sort": {"_id": 1}},
+        ]
 
-    output_dir = "output_notifications"
+    return [
+        {"$sort": {"type": 1, "_id": 1}},
+        # (type, status) buckets keep the status counts without pushing every status;
+        # missing and null statuses share one bucket so $arrayToObject sees one UNKNOWN key
+        {"$group": {
+            "_id": {"type": "$type", "status": {"$toString": {"$ifNull": ["$status", "UNKNOWN"]}}},
+            "doc": {"$first": "$$ROOT"},
+            "first_id": {"$first": "$_id"},
+            "count": {"$sum": 1},
+            "min_create": {"$min": "$createTimestamp"},
+            "max_create": {"$max": "$createTimestamp"},
+        }},
+        {"$sort": {"_id.type": 1, "first_id": 1}},
+        {"$group": {
+            "_id": "$_id.type",
+            "doc": {"$first": "$doc"},
+            "count": {"$sum": "$count"},
+            "statuses": {"$push": {"k": "$_id.status", "v": "$count"}},
+            "min_create": {"$min": "$min_create"},
+            "max_create": {"$max": "$max_create"},
+        }},
+        {"$project": {
+            "doc": 1, "count": 1, "min_create": 1, "max_create": 1,
+            "statuses": {"$arrayToObject": "$statuses"},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def export_first_documents(collection, output_dir: str, combined_path: str = None,
+                           stats_path: str = None) -> list:
+    """
+    Write the first document per type to output_dir/<TYPE>.json (and optionally all
+    of them to one combined JSON object) while streaming the aggregation cursor.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    with_stats = stats_path is not None
+    cursor = collection.aggregate(first_per_type_pipeline(with_stats), allowDiskUse=True)
+
+    types = []
+    stats = {}
+    combined = open(combined_path, "w", encoding="utf-8") if combined_path else None
+    try:
+        if combined:
+            combined.write("{")
+        for row in cursor:
+            t = row["_id"]
+            doc = row["doc"]
 
-    for t in types:
-        first_doc = collection.find_one({"type": t})
-        if first_doc:
             file_path = os.path.join(output_dir, f"{t}.json")
             with open(file_path, "w", encoding="utf-8") as f:
-                f.write(json_util.dumps(first_doc, indent=4, ensure_ascii=False))
-            print(f"✔ Saved to {file_path}")
\ No newline at end of file
+                f.write(json_util.dumps(doc, indent=4, ensure_ascii=False))
+            print(f"✔ Saved to {file_path}")
+
+            if combined:
+                combined.write("," if types else "")
+                combined.write(f"\n    {json_util.dumps(t)}: {json_util.dumps(doc, ensure_ascii=False)}")
+            if with_stats:
+                stats[t] = {
+                    "count": row["count"],
+                    "statuses": row["statuses"],
+                    "min_createTimestamp": row.get("min_create"),
+                    "max_createTimestamp": row.get("max_create"),
+                }
+            types.append(t)
+        if combined:
+            combined.write("\n}\n")
+    finally:
+        if combined:
+            combined.close()
+
+    if with_stats:
+        with open(stats_path, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(stats, indent=4, ensure_ascii=False))
+        print(f"✔ Saved stats to {stats_path}")
+    return types
+
+
+if __name__ == "__main__":
+    mongo = MongoConnection(collections=os.getenv("COLLECTIONS"))
+    client = mongo.connect()
+    db, collection = mongo.get_db()
+
+    types = export_first_documents(
+        collection,
+        output_dir="output_notifications",
+        combined_path="first_documents_by_type.json",
+        stats_path="notification_type_stats.json",
+    )
+    logging.info("All notification types: %s", types)
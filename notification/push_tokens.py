@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+
+logging.basicConfig(level=logging.INFO)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire ttl_seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, keys=None):
+        """Drop the given keys, or everything when keys is None."""
+        with self._lock:
+            if keys is None:
+                self._data.clear()
+                return
+            for key in keys:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _as_object_id(value):
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+
+def _unique_tokens(token_lists) -> list:
+    seen, tokens = set(), []
+    for token_list in token_lists:
+        for token in token_list or []:
+            key = str(token)
+            if key not in seen:
+                seen.add(key)
+                tokens.append(token)
+    return tokens
+
+
+class PushTokenResolver:
+    """
+    Organisation -> push notification tokens of all its members.
+
+    Cache misses for a whole batch of organisations are resolved together:
+    with one $lookup aggregation (default, one round trip) or with two bulk
+    $in queries (organisations, then accounts). Only pushNotificationTokens
+    is projected from accounts. Results, including organisations that do not
+    exist, are cached until they expire or are invalidated.
+    """
+
+    def __init__(self, org_collection, account_collection, cache_size: int = 1024,
+                 ttl_seconds: float = 300, use_lookup: bool = True):
+        self.org_collection = org_collection
+        self.account_collection = account_collection
+        self.cache = TTLCache(cache_size, ttl_seconds)
+        self.use_lookup = use_lookup
+
+    def _fetch_lookup(self, org_ids: list) -> dict:
+        pipeline = [
+            {"$match": {"_id": {"$in": org_ids}}},
+            {"$project": {"memberIds": 1}},
+            # Pipeline form: only the tokens are joined, never whole account documents
+            {"$lookup": {
+                "from": self.account_collection.name,
+                "let": {"memberIds": {"$ifNull": ["$memberIds", []]}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$in": ["$_id", "$$memberIds"]}}},
+                    {"$project": {"_id": 0, "pushNotificationTokens": 1}},
+                ],
+                "as": "accounts",
+            }},
+            {"$project": {"tokens": "$accounts.pushNotificationTokens"}},
+        ]
+        return {doc["_id"]: _unique_tokens(doc.get("tokens", []))
+                for doc in self.org_collection.aggregate(pipeline)}
+
+    def _fetch_in(self, org_ids: list) -> dict:
+        members = {doc["_id"]: doc.get("memberIds", [])
+                   for doc in self.org_collection.find({"_id": {"$in": org_ids}}, {"memberIds": 1})}
+        all_members = list({m for ids in members.values() for m in ids})
+        account_tokens = {doc["_id"]: doc.get("pushNotificationTokens", [])
+                          for doc in self.account_collection.find({"_id": {"$in": all_members}},
+                                                                  {"pushNotificationTokens": 1})}
+        return {org_id: _unique_tokens(account_tokens.get(m) for m in ids)
+                for org_id, ids in members.items()}
+
+    def resolve(self, org_ids) -> dict:
+        """{org_id: [tokens]} for every requested organisation (unknown ones map to [])."""
+        org_ids = list(dict.fromkeys(_as_object_id(o) for o in org_ids))
+        result, misses = {}, []
+        for org_id in org_ids:
+            tokens = self.cache.get(org_id)
+            if tokens is None:
+                misses.append(org_id)
+            else:
+                result[org_id] = tokens
+
+        if misses:
+            started = time.perf_counter()
+            fetched = self._fetch_lookup(misses) if self.use_lookup else self._fetch_in(misses)
+            for org_id in misses:
+                tokens = fetched.get(org_id, [])
+                self.cache.set(org_id, tokens)
+                result[org_id] = tokens
+            logging.info("Resolved %d organisations (%d cached) in %.1f ms",
+                         len(org_ids), len(org_ids) - len(misses), 1000 * (time.perf_counter() - started))
+        return result
+
+    def fan_out_tokens(self, org_ids) -> list:
+        """Every distinct token across the organisations, for a multi-org alert."""
+        return _unique_tokens(self.resolve(org_ids).values())
+
+    def invalidate(self, org_ids=None):
+        """Forget cached organisations (all of them when org_ids is None), e.g. after membership changes."""
+        self.cache.invalidate(None if org_ids is None else [_as_object_id(o) for o in org_ids])
@@ -0,0 +1,234 @@
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+
+# (threshold column, direction, level); critical first so it wins over a reminder on the same reading
+BANDS = [
+    ("critical_high", "RAISED_ABOVE", "CRITICAL"),
+    ("reminder_high", "RAISED_ABOVE", "REMINDER"),
+    ("critical_low", "DROPPED_BELOW", "CRITICAL"),
+    ("reminder_low", "DROPPED_BELOW", "REMINDER"),
+]
+# Notification type prefix per water parameter class (see first_documents_by_type.json)
+TYPE_PREFIXES = {"WIND_SPEED": "WIND_SPEED", "RAINFALL": "RAINFALL", "LUX_TEMP": "LUX_TEMP_VALUE"}
+DEFAULT_TYPE_PREFIX = "SENSOR_VALUE"
+THRESHOLD_COLUMNS = ["st", "waterParameterClass", "value_field", "pondId", "hysteresis", "min_gap_minutes"] \
+    + [band for band, _, _ in BANDS]
+SENSOR_KEYS = ["organisationId", "farmId", "pondId", "gatewayId"]
+ALERT_COLUMNS = SENSOR_KEYS + ["sId", "t", "waterParameterClass", "value", "threshold", "type"]
+
+
+def notification_type(water_parameter_class: str, direction: str, level: str) -> str:
+    prefix = TYPE_PREFIXES.get(water_parameter_class, DEFAULT_TYPE_PREFIX)
+    return f"{prefix}_{direction}_{level}"
+
+
+def _match_rules(measurements: pd.DataFrame, thresholds: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (measurement, rule). Rules with a pondId apply to that pond
+    only and replace the pondId-less default rule for the same
+    (st, waterParameterClass).
+    """
+    thresholds = thresholds.reindex(columns=THRESHOLD_COLUMNS).copy()
+    thresholds["value_field"] = thresholds["value_field"].fillna("v")
+    thresholds["hysteresis"] = thresholds["hysteresis"].fillna(0.0)
+    thresholds["min_gap_minutes"] = thresholds["min_gap_minutes"].fillna(0.0)
+    thresholds["rule_id"] = np.arange(len(thresholds))
+    # Join keys as object on both sides: an all-NaN pondId would otherwise be float64
+    thresholds["st"] = thresholds["st"].astype(object)
+    thresholds["pondId"] = thresholds["pondId"].astype(object)
+
+    pond_rules = thresholds[thresholds["pondId"].notna()]
+    default_rules = thresholds[thresholds["pondId"].isna()].drop(columns="pondId")
+
+    matched = [measurements.merge(pond_rules, on=["pondId", "st"], how="inner")]
+    if len(default_rules):
+        defaults = measurements.merge(default_rules, on="st", how="inner")
+        if len(pond_rules):
+            overridden = defaults.set_index(["pondId", "st", "waterParameterClass"]).index.isin(
+                pond_rules.set_index(["pondId", "st", "waterParameterClass"]).index)
+            defaults = defaults[~overridden]
+        matched.append(defaults)
+    return pd.concat(matched, ignore_index=True)
+
+
+def _entries(starts: np.ndarray, enter: np.ndarray, leave: np.ndarray) -> np.ndarray:
+    """
+    Indices where a hysteresis state switches on. The state turns on when
+    `enter` holds, off when `leave` holds, and otherwise keeps its previous
+    value; every series (from each start) begins off unless it enters.
+    """
+    n = len(enter)
+    decided = enter | leave
+    decided[starts] = True
+    last = np.maximum.accumulate(np.where(decided, np.arange(n), 0))
+    state = enter[last]
+    prev = np.empty(n, dtype=bool)
+    prev[0] = False
+    prev[1:] = state[:-1]
+    prev[starts] = False
+    return np.flatnonzero(state & ~prev)
+
+
+def _suppress(times_ms: np.ndarray, groups: np.ndarray, min_gap_ms: np.ndarray) -> np.ndarray:
+    """Keep an alert only if min_gap has passed since the last kept alert of the same group."""
+    keep = np.ones(len(times_ms), dtype=bool)
+    last = {}
+    # Plain lists: the loop only runs over alert candidates, not readings
+    for i, (t, g, gap) in enumerate(zip(times_ms.tolist(), groups.tolist(), min_gap_ms.tolist())):
+        if g in last and t - last[g] < gap:
+            keep[i] = False
+        else:
+            last[g] = t
+    return keep
+
+
+def evaluate(measurements: pd.DataFrame, thresholds: pd.DataFrame, sensors: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    All reminder/critical crossings for columnar measurements (sId, st, t, v..v4)
+    against a threshold table (st, waterParameterClass, value_field, optional
+    pondId, reminder/critical low/high, hysteresis, min_gap_minutes).
+
+    `sensors` maps sId to organisationId/farmId/pondId/gatewayId. Readings are
+    sorted once by (sensor, rule, t) and every band is evaluated over the whole
+    array: an alert fires when a reading crosses the threshold, and cannot fire
+    again until the value is back past the threshold by `hysteresis` and at
+    least min_gap_minutes have passed since the previous alert of that band.
+    """
+    started = time.perf_counter()
+    if sensors is None and "pondId" in thresholds.columns and thresholds["pondId"].notna().any():
+        logging.warning("Pond-specific thresholds need a sensors table (sId -> pondId); they match nothing")
+    if measurements.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+
+    df = measurements.copy()
+    df["sId"] = df["sId"].astype(str).astype(object)
+    df["st"] = df["st"].astype(str).astype(object)
+    if sensors is not None:
+        sensors = sensors.copy()
+        sensors["sId"] = sensors["sId"].astype(str).astype(object)
+        df = df.merge(sensors[["sId"] + [k for k in SENSOR_KEYS if k in sensors.columns]], on="sId", how="left")
+    for key in SENSOR_KEYS:
+        if key not in df.columns:
+            df[key] = None
+    df["pondId"] = df["pondId"].astype(object)
+
+    rows = _match_rules(df, thresholds)
+    if rows.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    # Sort (sensor, rule, t) as integer keys; columns are only gathered in that order when needed
+    series = rows.groupby(["sId", "rule_id"]).ngroup().to_numpy()
+    t_ms = pd.to_datetime(rows["t"], utc=True).dt.tz_localize(None).to_numpy("datetime64[ms]").astype(np.int64)
+    order = np.lexsort((t_ms, series))
+    series, t_ms = series[order], t_ms[order]
+    starts = np.flatnonzero(np.r_[True, series[1:] != series[:-1]])
+
+    # Value of each row's rule field, without a per-row lookup
+    value = np.full(len(rows), np.nan)
+    for field in rows["value_field"].unique():
+        mask = (rows["value_field"] == field).to_numpy()
+        value[mask] = rows.loc[mask, field].to_numpy(dtype=float)
+    value = value[order]
+    hysteresis = rows["hysteresis"].to_numpy(dtype=float)[order]
+    min_gap_ms = rows["min_gap_minutes"].to_numpy(dtype=float)[order] * 60_000
+    valid = ~np.isnan(value)
+
+    found = []
+    fired_at = {}
+    for band, direction, level in BANDS:
+        threshold = rows[band].to_numpy(dtype=float)[order]
+        active = valid & ~np.isnan(threshold)
+        if not active.any():
+            continue
+        if direction == "RAISED_ABOVE":
+            enter = active & (value > threshold)
+            leave = active & (value < threshold - hysteresis)
+        else:
+            enter = active & (value < threshold)
+            leave = active & (value > threshold + hysteresis)
+        idx = _entries(starts, enter, leave)
+        if level == "REMINDER" and direction in fired_at:
+            # A critical alert on the same reading already covers the reminder
+            idx = np.setdiff1d(idx, fired_at[direction], assume_unique=True)
+        keep = _suppress(t_ms[idx], series[idx], min_gap_ms[idx])
+        idx = idx[keep]
+        if level == "CRITICAL":
+            fired_at[direction] = idx
+        found.append((idx, band, direction, level, threshold))
+
+    alerts = []
+    for idx, band, direction, level, threshold in found:
+        if not len(idx):
+            continue
+        part = rows.iloc[order[idx]][SENSOR_KEYS + ["sId", "t", "waterParameterClass"]].reset_index(drop=True)
+        part["value"] = value[idx]
+        part["threshold"] = threshold[idx]
+        types = {c: notification_type(c, direction, level) for c in part["waterParameterClass"].unique()}
+        part["type"] = part["waterParameterClass"].map(types)
+        alerts.append(part)
+
+    result = (pd.concat(alerts, ignore_index=True).sort_values(["t", "sId"], ignore_index=True)
+              if alerts else pd.DataFrame(columns=ALERT_COLUMNS))
+    logging.info("Evaluated %d readings against %d rules: %d alerts in %.3fs",
+                 len(rows), len(thresholds), len(result), time.perf_counter() - started)
+    return result
+
+
+def _node(value) -> dict:
+    return {"value": value}
+
+
+def to_notifications(alerts: pd.DataFrame, channel: str = "PUSH_NOTIFICATION") -> list:
+    """Alert rows as documents shaped like notification_resource_notifications."""
+    docs = []
+    for row in alerts.itertuples(index=False):
+        t = pd.Timestamp(row.t)
+        docs.append({
+            "organisationId": row.organisationId,
+            "farmId": row.farmId,
+            "pondId": row.pondId,
+            "gatewayId": row.gatewayId,
+            "type": row.type,
+            "channel": channel,
+            "createTimestamp": t.to_pydatetime(),
+            "payload": {"nodes": {"data": {"nodes": {"nodes": {"nodes": {
+                "sensorId": _node(row.sId),
+                "threshold": _node(float(row.threshold)),
+                "value": _node(float(row.value)),
+                "waterParameterClass": _node(row.waterParameterClass),
+                "timestamp": _node(t.strftime("%Y-%m-%dT%H:%M:%S")),
+            }}}}}},
+        })
+    return docs
+
+
+def backtest(measurements: pd.DataFrame, threshold_sets: dict, sensors: pd.DataFrame = None) -> pd.DataFrame:
+    """Alert counts per notification type for each named threshold configuration."""
+    counts = {}
+    for name, thresholds in threshold_sets.items():
+        counts[name] = evaluate(measurements, thresholds, sensors)["type"].value_counts()
+    return pd.DataFrame(counts).fillna(0).astype(int)
+
+
+if __name__ == "__main__":
+    from datetime import datetime, timedelta, timezone
+
+    from sensor.measurement_cache import MeasurementCache
+
+    cache = MeasurementCache(os.getenv("MEASUREMENT_CACHE_DIR", "measurement_cache"))
+    days = int(os.getenv("ALERT_BACKTEST_DAYS", "90"))
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    measurements = cache.load(start=start).to_pandas()
+
+    thresholds = pd.read_csv(os.getenv("ALERT_THRESHOLDS_PATH", "alert_thresholds.csv"))
+    sensors_path = os.getenv("ALERT_SENSORS_PATH")
+    sensors = pd.read_parquet(sensors_path) if sensors_path else None
+
+    alerts = evaluate(measurements, thresholds, sensors)
+    print(alerts["type"].value_counts())
+    alerts.to_parquet(os.getenv("ALERT_OUTPUT_PATH", "alerts_backtest.parquet"), index=False)
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logging.basicConfig(level=logging.INFO)
+
+SENSOR_TYPES = [
+    'YDS', 'NDP', 'SAP', 'SES', 'OCS', 'OMS',
+    'STOF', 'LUX', 'IDS', 'WSS', 'WDS', 'RFS', 'OGPS'
+]
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Keys that may hold the page items / the total count in a paginated response
+ITEM_KEYS = ("data", "items", "results", "content", "sensors")
+TOTAL_KEYS = ("total", "totalCount", "count", "totalElements")
+
+
+def make_session(token: str = None, pool_size: int = 16, retries: int = 5, backoff: float = 0.5) -> requests.Session:
+    """
+    Session with a keep-alive pool of pool_size connections. 429 and 5xx
+    responses are retried with exponential backoff (honouring Retry-After).
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+
+def page_items(payload):
+    """(items, total or None) for a bare list or a {data/items/..., total/...} envelope."""
+    if isinstance(payload, list):
+        return payload, None
+    items = next((payload[k] for k in ITEM_KEYS if isinstance(payload.get(k), list)), [])
+    total = next((payload[k] for k in TOTAL_KEYS if isinstance(payload.get(k), int)), None)
+    return items, total
+
+
+def flatten(item: dict, prefix: str = "") -> dict:
+    """Nested objects become dotted columns; lists are kept as JSON strings."""
+    row = {}
+    for key, value in item.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            row.update(flatten(value, name + "."))
+        elif isinstance(value, list):
+            row[name] = json.dumps(value, default=str)
+        else:
+            row[name] = value
+    return row
+
+
+def infer_schema(rows: list) -> pa.Schema:
+    """Schema over the union of the rows' keys; mixed-type or all-null columns become strings."""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    fields = []
+    for name in names:
+        try:
+            field_type = pa.array([row.get(name) for row in rows]).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            field_type = pa.string()
+        fields.append(pa.field(name, pa.string() if pa.types.is_null(field_type) else field_type))
+    return pa.schema(fields)
+
+
+class SensorInventoryClient:
+    """
+    Fetches every page of /api/v1/sensors for every sensor type through one
+    pooled Session and at most max_workers requests in flight.
+
+    The first page of every type is requested at once. When a response
+    carries a total, all remaining pages of that type are requested together;
+    otherwise pages are followed one after another until a short page.
+    """
+
+    def __init__(self, base_url: str, token: str = None, page_size: int = 100, max_workers: int = 8,
+                 timeout: float = 30, retries: int = 5, backoff: float = 0.5):
+        self.url = f"{base_url.rstrip('/')}/api/v1/sensors"
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = make_session(token, pool_size=max_workers, retries=retries, backoff=backoff)
+
+    def fetch_page(self, sensor_type: str, offset: int):
+        params = {"limit": self.page_size, "offset": offset, "sensorTypes": sensor_type}
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return page_items(response.json())
+
+    def iter_pages(self, sensor_types: list = None):
+        """Yield (sensor_type, offset, items) in completion order."""
+        sensor_types = sensor_types or SENSOR_TYPES
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {pool.submit(self.fetch_page, t, 0): (t, 0) for t in sensor_types}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sensor_type, offset = pending.pop(future)
+                    items, total = future.result()
+                    if offset == 0 and total is not None:
+                        for next_offset in range(self.page_size, total, self.page_size):
+                            pending[pool.submit(self.fetch_page, sensor_type, next_offset)] = (sensor_type, next_offset)
+                    elif total is None and len(items) >= self.page_size:
+                        next_offset = offset + self.page_size
+                        pending[pool.submit(self.fetch_page, sensor_type, next_offset)] = (sensor_type, next_offset)
+                    yield sensor_type, offset, items
+
+    def snapshot(self, path: str, sensor_types: list = None) -> dict:
+        """
+        Write the whole inventory to one Parquet file while pages arrive.
+
+        Columns are the flattened fields seen in the first page of every type
+        (plus sensor_type, page_offset, fetched_at); each row also keeps the
+        full item as JSON in `document`, so fields that only appear later are
+        not lost. Returns {sensor_type: rows}.
+        """
+        sensor_types = sensor_types or SENSOR_TYPES
+        fetched_at = datetime.now(timezone.utc)
+        counts = {t: 0 for t in sensor_types}
+        waiting_first = set(sensor_types)
+        buffered = []
+        writer = None
+        schema = None
+        tmp_path = path + ".tmp"
+        started = time.perf_counter()
+
+        def to_rows(sensor_type, offset, items):
+            return [{**flatten(item), "sensor_type": sensor_type, "page_offset": offset,
+                     "fetched_at": fetched_at, "document": json.dumps(item, default=str)} for item in items]
+
+        def write(rows):
+            columns = {name: [row.get(name) for row in rows] for name in schema.names}
+            arrays = []
+            for field in schema:
+                try:
+                    arrays.append(pa.array(columns[field.name], type=field.type))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # Type changed after the first pages: the value stays in `document`
+                    arrays.append(pa.nulls(len(rows), type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+        try:
+            for sensor_type, offset, items in self.iter_pages(sensor_types):
+                counts[sensor_type] += len(items)
+                rows = to_rows(sensor_type, offset, items)
+                if writer is None:
+                    buffered.extend(rows)
+                    if offset == 0:
+                        waiting_first.discard(sensor_type)
+                    if waiting_first:
+                        continue
+                    schema = infer_schema(buffered) if buffered else pa.schema([
+                        ("sensor_type", pa.string()), ("page_offset", pa.int64()),
+                        ("fetched_at", pa.timestamp("us", tz="UTC")), ("document", pa.string())])
+                    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+                    rows, buffered = buffered, []
+                if rows:
+                    write(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            # Only reached with no sensor types at all
+            return counts
+        os.replace(tmp_path, path)
+        logging.info("Sensor inventory: %d sensors in %.2fs -> %s",
+                     sum(counts.values()), time.perf_counter() - started, path)
+        return counts
@@ -1,35 +1,26 @@
-import requests
 import os
 from dotenv import load_dotenv
 
+from sensor.inventory import SENSOR_TYPES, SensorInventoryClient
+
 load_dotenv()
 
 OPENAPI_BASE_URL = os.getenv("OPENAPI_BASE_URL")
 OPENAPI_AUTH_TOKEN = os.getenv("OPENAPI_AUTH_TOKEN")
 
-sensor_types = [
-    'YDS', 'NDP', 'SAP', 'SES', 'OCS', 'OMS', 
-    'STOF', 'LUX', 'IDS', 'WSS', 'WDS', 'RFS', 'OGPS'
-]
-
-url = f"{OPENAPI_BASE_URL}/api/v1/sensors"
-headers = {
-    "Authorization": f"Bearer {OPENAPI_AUTH_TOKEN}"
-}
+sensor_types = SENSOR_TYPES
 
-for sensor in sensor_types:
-    params = {
-        "limit": 10,
-        "offset": 0,
-        "sensorTypes": sensor
-    }
+if __name__ == "__main__":
+    client = SensorInventoryClient(
+        OPENAPI_BASE_URL,
+        token=OPENAPI_AUTH_TOKEN,
+        page_size=int(os.getenv("SENSOR_PAGE_SIZE", "100")),
+        max_workers=int(os.getenv("SENSOR_MAX_WORKERS", "8")),
+    )
+    output_path = os.getenv("SENSOR_SNAPSHOT_PATH", "sensor_inventory.parquet")
+    counts = client.snapshot(output_path, sensor_types)
 
-    response = requests.get(url, headers=headers, params=params)
-    
-    print("="*20 + f" {sensor} " + "="*20)
-    print("Status Code:", response.status_code)
-    
-    try:
-        print("Response JSON:", response.json())
-    except ValueError:
-        print("Response is not JSON:", response.text)
+    for sensor, count in counts.items():
+        print("=" * 20 + f" {sensor} " + "=" * 20)
+        print("Sensors:", count)
+    print(f"Saved to {output_path}")
@@ -0,0 +1,210 @@
+import logging
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from sensor.measurements import VALUE_FIELDS, MeasurementReader
+
+logging.basicConfig(level=logging.INFO)
+
+PART_RE = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+PARTITIONING = ds.partitioning(pa.schema([("st", pa.string()), ("day", pa.string())]), flavor="hive")
+FILE_SCHEMA = pa.schema(
+    [("sId", pa.string()), ("t", pa.timestamp("ms", tz="UTC"))] + [(f, pa.float64()) for f in VALUE_FIELDS]
+)
+
+
+def _to_ms(t: datetime) -> int:
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return int(t.timestamp() * 1000)
+
+
+def _from_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+class MeasurementCache:
+    """
+    Local Parquet copy of sensor_resource_measurements under
+    root/st=<sensor type>/day=<YYYY-MM-DD>/part-<first t ms>-<last t ms>.parquet.
+
+    Files are sorted by (sId, t) and written under a temporary name, then
+    renamed, so the newest last-t in a sensor type's file names is its
+    high-water mark and a sync only asks Mongo for measurements after it.
+    Reads go through pyarrow.dataset over a memory-mapped local filesystem:
+    st/day prune whole directories and t/sId filters use row-group statistics.
+    """
+
+    def __init__(self, root: str, row_group_size: int = 64_000):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.filesystem = pafs.LocalFileSystem(use_mmap=True)
+        os.makedirs(root, exist_ok=True)
+
+    # -- layout ------------------------------------------------------------
+
+    def _partition_dir(self, sensor_type: str, day: str, root: str = None) -> str:
+        return os.path.join(root or self.root, f"st={sensor_type}", f"day={day}")
+
+    def sensor_types(self) -> list:
+        return sorted(name[3:] for name in os.listdir(self.root) if name.startswith("st="))
+
+    def high_water_mark(self, sensor_type: str):
+        """Newest cached t (epoch ms) for a sensor type, or None."""
+        st_dir = os.path.join(self.root, f"st={sensor_type}")
+        if not os.path.isdir(st_dir):
+            return None
+        # Day directories sort chronologically; the newest one holds the mark
+        for day_dir in sorted(os.listdir(st_dir), reverse=True):
+            marks = [int(m.group(2)) for name in os.listdir(os.path.join(st_dir, day_dir))
+                     if (m := PART_RE.match(name))]
+            if marks:
+                return max(marks)
+        return None
+
+    # -- writes ------------------------------------------------------------
+
+    def _write_partition(self, sensor_type: str, day: str, table: pa.Table, root: str = None) -> str:
+        table = table.sort_by([("sId", "ascending"), ("t", "ascending")])
+        t_ms = pc.cast(table["t"], pa.int64())
+        first, last = pc.min(t_ms).as_py(), pc.max(t_ms).as_py()
+        out_dir = self._partition_dir(sensor_type, day, root)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"part-{first}-{last}.parquet")
+        tmp_path = os.path.join(out_dir, f".part-{first}-{last}.parquet.tmp")
+        pq.write_table(table, tmp_path, compression="zstd", row_group_size=self.row_group_size)
+        os.replace(tmp_path, path)
+        return path
+
+    def _write_window(self, sensor_type: str, batches: list) -> int:
+        """
+        Stage every day of the window under root/.staging-<type>, then move the
+        files into place oldest day first. The high-water mark only passes a day
+        once every earlier day of the window is in place, so an interrupted
+        window is fetched again instead of leaving a gap.
+        """
+        if not batches:
+            return 0
+        table = pa.Table.from_batches(batches).select(FILE_SCHEMA.names).cast(FILE_SCHEMA)
+        days = pc.strftime(table["t"], format="%Y-%m-%d")
+        staging = os.path.join(self.root, f".staging-{sensor_type}")
+        shutil.rmtree(staging, ignore_errors=True)
+
+        staged = [(day, self._write_partition(sensor_type, day, table.filter(pc.equal(days, day)), root=staging))
+                  for day in sorted(pc.unique(days).to_pylist())]
+        for day, path in staged:
+            out_dir = self._partition_dir(sensor_type, day)
+            os.makedirs(out_dir, exist_ok=True)
+            os.replace(path, os.path.join(out_dir, os.path.basename(path)))
+        shutil.rmtree(staging, ignore_errors=True)
+        return table.num_rows
+
+    def sync(self, collection, sensor_types: list = None, since: datetime = None,
+             until: datetime = None, window_days: int = 7) -> dict:
+        """
+        Pull measurements newer than each sensor type's high-water mark (or
+        `since` when nothing is cached yet), window_days at a time so the
+        first sync of a long history never holds it all in memory.
+        Returns {sensor_type: rows added}.
+        """
+        sensor_types = sensor_types or sorted(collection.distinct("st"))
+        until = until or datetime.now(timezone.utc)
+        reader = MeasurementReader(collection)
+        added = {}
+
+        for sensor_type in sensor_types:
+            mark = self.high_water_mark(sensor_type)
+            if mark is not None:
+                # Mongo dates are millisecond precision, so +1 ms is "strictly after"
+                start = _from_ms(mark + 1)
+            elif since is not None:
+                start = since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+            else:
+                raise ValueError(f"No cached data for {sensor_type}; pass `since` for the first sync")
+
+            started = time.perf_counter()
+            added[sensor_type] = 0
+            while start < until:
+                end = min(start + timedelta(days=window_days), until)
+                batches = list(reader.iter_batches(None, start, end, sensor_types=[sensor_type]))
+                added[sensor_type] += self._write_window(sensor_type, batches)
+                start = end
+            logging.info("Synced %s: %d new rows in %.2fs", sensor_type, added[sensor_type],
+                         time.perf_counter() - started)
+        return added
+
+    def compact(self, sensor_type: str, before_day: str = None) -> int:
+        """Merge each day's part files into one (days before `before_day`, default today)."""
+        before_day = before_day or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        st_dir = os.path.join(self.root, f"st={sensor_type}")
+        merged = 0
+        for day_dir in sorted(os.listdir(st_dir)):
+            day = day_dir.split("=", 1)[1]
+            if day >= before_day:
+                continue
+            parts = [os.path.join(st_dir, day_dir, name) for name in os.listdir(os.path.join(st_dir, day_dir))
+                     if PART_RE.match(name)]
+            if len(parts) < 2:
+                continue
+            table = pa.concat_tables(pq.read_table(p, schema=FILE_SCHEMA) for p in parts)
+            new_path = self._write_partition(sensor_type, day, table)
+            for p in parts:
+                if p != new_path:
+                    os.remove(p)
+            merged += 1
+        return merged
+
+    # -- reads -------------------------------------------------------------
+
+    def dataset(self) -> ds.Dataset:
+        schema = pa.schema(list(FILE_SCHEMA) + list(PARTITIONING.schema))
+        return ds.dataset(self.root, schema=schema, format="parquet", partitioning=PARTITIONING,
+                          filesystem=self.filesystem, ignore_prefixes=[".", "_"])
+
+    def load(self, start: datetime = None, end: datetime = None, sensor_types: list = None,
+             sensor_ids: list = None, columns: list = None) -> pa.Table:
+        """start <= t < end from the local store, with partition and row-group pruning."""
+        expr = None
+
+        def add(cond):
+            nonlocal expr
+            expr = cond if expr is None else expr & cond
+
+        if sensor_types:
+            add(ds.field("st").isin(list(sensor_types)))
+        if start is not None:
+            # Day partitions are UTC dates
+            add(ds.field("day") >= _from_ms(_to_ms(start)).strftime("%Y-%m-%d"))
+            add(ds.field("t") >= pa.scalar(_to_ms(start), pa.int64()).cast(pa.timestamp("ms", tz="UTC")))
+        if end is not None:
+            add(ds.field("day") <= _from_ms(_to_ms(end)).strftime("%Y-%m-%d"))
+            add(ds.field("t") < pa.scalar(_to_ms(end), pa.int64()).cast(pa.timestamp("ms", tz="UTC")))
+        if sensor_ids:
+            add(ds.field("sId").isin([str(s) for s in sensor_ids]))
+
+        table = self.dataset().to_table(columns=columns, filter=expr)
+        return table.sort_by([("sId", "ascending"), ("t", "ascending")]) if "t" in table.column_names else table
+
+
+if __name__ == "__main__":
+    from mongo.connection import MongoConnection
+
+    mongo = MongoConnection(collections="sensor_resource_measurements")
+    db, collection = mongo.get_db()
+
+    cache = MeasurementCache(os.getenv("MEASUREMENT_CACHE_DIR", "measurement_cache"))
+    since = datetime.now(timezone.utc) - timedelta(days=int(os.getenv("MEASUREMENT_CACHE_DAYS", "30")))
+    print(cache.sync(collection, since=since))
+
+    start = time.perf_counter()
+    table = cache.load(start=since)
+    print(f"Loaded {table.num_rows} cached rows in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,175 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO)
+
+VALUE_FIELDS = ["v", "v2", "v3", "v4"]
+AGGREGATES = ["min", "max", "mean"]
+DAY_MS = 86_400_000
+# Measurement time as epoch milliseconds: int64 arrays decode much faster than datetimes
+T_MS = {"$toLong": "$t"}
+
+
+def _as_object_ids(sensor_ids) -> list:
+    if isinstance(sensor_ids, (str, ObjectId)):
+        sensor_ids = [sensor_ids]
+    return [ObjectId(s) if isinstance(s, str) and ObjectId.is_valid(s) else s for s in sensor_ids]
+
+
+def _floor_ms(expr, step_ms: int) -> dict:
+    """expr (epoch ms) rounded down to a multiple of step_ms."""
+    return {"$subtract": [expr, {"$mod": [expr, step_ms]}]}
+
+
+def _match(sensor_ids, start: datetime, end: datetime, sensor_types: list = None) -> dict:
+    """start <= t < end for the given sensors (served by an index on sId, t) and/or sensor types."""
+    query = {"t": {"$gte": start, "$lt": end}}
+    if sensor_ids is not None:
+        query["sId"] = {"$in": _as_object_ids(sensor_ids)}
+    if sensor_types is not None:
+        query["st"] = {"$in": list(sensor_types)}
+    return {"$match": query}
+
+
+def raw_pipeline(sensor_ids, start: datetime, end: datetime, sensor_types: list = None) -> list:
+    """
+    Raw measurements packed into one document per (sensor, day) holding
+    parallel arrays (t as epoch ms, v..v4), so the client decodes a few
+    arrays per day instead of one dict per measurement.
+    """
+    t_ms = T_MS
+    push = {f: {"$push": {"$ifNull": [f"${f}", None]}} for f in VALUE_FIELDS}
+    return [
+        _match(sensor_ids, start, end, sensor_types),
+        {"$project": {"sId": 1, "st": 1, "t": 1, **{f: 1 for f in VALUE_FIELDS}}},
+        {"$sort": {"sId": 1, "t": 1}},
+        {"$group": {
+            "_id": {"sId": "$sId", "day": _floor_ms(t_ms, DAY_MS)},
+            "st": {"$first": "$st"},
+            "t": {"$push": t_ms},
+            **push,
+        }},
+        {"$sort": {"_id.sId": 1, "_id.day": 1}},
+    ]
+
+
+def downsample_pipeline(sensor_ids, start: datetime, end: datetime, every_minutes: int,
+                        sensor_types: list = None) -> list:
+    """
+    min/max/mean of v..v4 (and the sample count) per every_minutes bucket,
+    computed on the server and packed per (sensor, day) like raw_pipeline.
+    """
+    t_ms = T_MS
+    stats = {}
+    for f in VALUE_FIELDS:
+        stats[f"{f}_min"] = {"$min": f"${f}"}
+        stats[f"{f}_max"] = {"$max": f"${f}"}
+        stats[f"{f}_mean"] = {"$avg": f"${f}"}
+    columns = ["n"] + list(stats)
+    return [
+        _match(sensor_ids, start, end, sensor_types),
+        {"$group": {
+            "_id": {"sId": "$sId", "t": _floor_ms(t_ms, every_minutes * 60_000)},
+            "st": {"$first": "$st"},
+            "n": {"$sum": 1},
+            **stats,
+        }},
+        {"$sort": {"_id.sId": 1, "_id.t": 1}},
+        {"$group": {
+            "_id": {"sId": "$_id.sId", "day": _floor_ms("$_id.t", DAY_MS)},
+            "st": {"$first": "$st"},
+            "t": {"$push": "$_id.t"},
+            **{c: {"$push": {"$ifNull": [f"${c}", None]}} for c in columns},
+        }},
+        {"$sort": {"_id.sId": 1, "_id.day": 1}},
+    ]
+
+
+class MeasurementReader:
+    """
+    sensor_resource_measurements by sensor id(s) and time range as Arrow tables
+    (sId, st, t, then v..v4 or their per-bucket n/min/max/mean), built
+    column by column from the packed per-day documents.
+    """
+
+    def __init__(self, collection, batch_size: int = 16):
+        self.collection = collection
+        self.batch_size = batch_size
+
+    def iter_batches(self, sensor_ids, start: datetime, end: datetime, every_minutes: int = None,
+                     sensor_types: list = None):
+        """
+        One RecordBatch per (sensor, day), in sensor then time order.
+        sensor_ids=None reads every sensor of `sensor_types`.
+        """
+        if every_minutes:
+            pipeline = downsample_pipeline(sensor_ids, start, end, every_minutes, sensor_types)
+            value_columns = ["n"] + [f"{f}_{a}" for f in VALUE_FIELDS for a in AGGREGATES]
+        else:
+            pipeline = raw_pipeline(sensor_ids, start, end, sensor_types)
+            value_columns = VALUE_FIELDS
+
+        cursor = self.collection.aggregate(pipeline, allowDiskUse=True, batchSize=self.batch_size)
+        for doc in cursor:
+            n = len(doc["t"])
+            arrays = [
+                pa.array([str(doc["_id"]["sId"])] * n, pa.string()).dictionary_encode(),
+                pa.array([doc.get("st")] * n, pa.string()).dictionary_encode(),
+                pa.array(doc["t"], pa.int64()).cast(pa.timestamp("ms", tz="UTC")),
+            ]
+            for c in value_columns:
+                arrays.append(pa.array(doc[c], pa.int64() if c == "n" else pa.float64()))
+            yield pa.RecordBatch.from_arrays(arrays, ["sId", "st", "t"] + value_columns)
+
+    def read(self, sensor_ids, start: datetime, end: datetime, every_minutes: int = None,
+             sensor_types: list = None) -> pa.Table:
+        started = time.perf_counter()
+        batches = list(self.iter_batches(sensor_ids, start, end, every_minutes, sensor_types))
+        if batches:
+            table = pa.Table.from_batches(batches).unify_dictionaries()
+        else:
+            fields = [("sId", pa.string()), ("st", pa.string()), ("t", pa.timestamp("ms", tz="UTC"))]
+            if every_minutes:
+                fields += [("n", pa.int64())] + [(f"{f}_{a}", pa.float64()) for f in VALUE_FIELDS for a in AGGREGATES]
+            else:
+                fields += [(f, pa.float64()) for f in VALUE_FIELDS]
+            table = pa.schema(fields).empty_table()
+        logging.info("Read %d rows (%s) in %.3fs", table.num_rows,
+                     f"{every_minutes} min buckets" if every_minutes else "raw", time.perf_counter() - started)
+        return table
+
+
+def sensor_arrays(table: pa.Table, sensor_id) -> dict:
+    """NumPy arrays (t as datetime64[ms], values as float64 with NaN) for one sensor."""
+    rows = table.filter(pc.equal(table["sId"].cast(pa.string()), str(sensor_id)))
+    out = {"t": rows["t"].to_numpy().astype("datetime64[ms]")}
+    for name in rows.column_names[3:]:
+        out[name] = rows[name].cast(pa.float64()).fill_null(float("nan")).to_numpy()
+    return out
+
+
+if __name__ == "__main__":
+    from mongo.connection import MongoConnection
+
+    mongo = MongoConnection(collections="sensor_resource_measurements")
+    db, collection = mongo.get_db()
+    reader = MeasurementReader(collection)
+
+    sensor_id = "67b3039d85c10e3ee466eccd"
+    start = datetime(2025, 4, 21, tzinfo=timezone.utc)
+    end = datetime(2025, 4, 22, tzinfo=timezone.utc)
+
+    raw = reader.read([sensor_id], start, end)
+    print(raw.slice(0, 10).to_pandas())
+
+    every = int(os.getenv("DOWNSAMPLE_MINUTES", "15"))
+    downsampled = reader.read([sensor_id], start, end, every_minutes=every)
+    print(downsampled.slice(0, 10).to_pandas())
@@ -1,36 +1,261 @@
+import hashlib
+import json
+import logging
 import os
+import numpy as np
+import pandas as pd
 import geopandas as gpd
+import shapely
 from shapely.geometry import Point
 
+METERS_PER_DEGREE = 111_000.0
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def _source_signature(path: str) -> dict:
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "mtime": st.st_mtime, "size": st.st_size}
+
+
+def _shapefile_digest(path: str) -> str:
+    """sha256 over the shapefile and its sidecar files (.shx/.dbf/.prj/.cpg)."""
+    base = os.path.splitext(path)[0]
+    digest = hashlib.sha256()
+    for ext in SHAPEFILE_PARTS:
+        part = base + ext
+        if os.path.exists(part):
+            digest.update(ext.encode())
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AdminGrid:
+    """
+    Precomputed lookup grid over the shapefile's bounding box.
+
+    Each cell holds 1 + the polygon position when the whole cell lies inside
+    one polygon, 0 when it lies outside every polygon, and the dtype's max
+    value when a boundary passes through it (those points need the exact
+    test). The grid is a .npy opened with mmap, next to a .json with the
+    grid geometry and a .attrs.parquet with the admin names/codes per polygon,
+    so opening it never touches the shapefile.
+    """
+
+    def __init__(self, codes: np.ndarray, meta: dict, attrs: pd.DataFrame):
+        self.codes = codes
+        self.meta = meta
+        self.x0 = meta["x0"]
+        self.y0 = meta["y0"]
+        self.res = meta["resolution_deg"]
+        self.boundary = np.iinfo(codes.dtype).max
+        self.attrs = {key: attrs[key].to_numpy(dtype=object) for key in attrs.columns}
+
+    @staticmethod
+    def _paths(path: str):
+        return f"{path}.npy", f"{path}.json", f"{path}.attrs.parquet"
+
+    @classmethod
+    def open(cls, path: str, source_path: str = None):
+        """The grid at path, or None if it is missing or was built from a different shapefile."""
+        npy_path, meta_path, attrs_path = cls._paths(path)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if source_path is not None and meta.get("source") != _source_signature(source_path):
+            return None
+        codes = np.load(npy_path, mmap_mode="r")
+        return cls(codes, meta, pd.read_parquet(attrs_path))
+
+    @classmethod
+    def build(cls, locator, path: str, resolution_m: float = 100.0):
+        gdf = locator.gdf
+        res = resolution_m / METERS_PER_DEGREE
+        minx, miny, maxx, maxy = (float(v) for v in gdf.total_bounds)
+        nx = int(np.ceil((maxx - minx) / res))
+        ny = int(np.ceil((maxy - miny) / res))
+        dtype = np.uint16 if len(gdf) + 1 < np.iinfo(np.uint16).max else np.uint32
+        boundary = np.iinfo(dtype).max
+
+        # Owner of every cell corner, rasterised one polygon at a time over its bbox
+        corners = np.zeros((ny + 1, nx + 1), dtype=dtype)
+        geoms = gdf.geometry.values
+        # Reversed so that where polygons overlap the lowest position wins, as in the exact test
+        for k in range(len(geoms) - 1, -1, -1):
+            geom = geoms[k]
+            if geom is None or geom.is_empty:
+                continue
+            gx0, gy0, gx1, gy1 = geom.bounds
+            j0, j1 = max(int((gx0 - minx) / res), 0), min(int(np.ceil((gx1 - minx) / res)), nx)
+            i0, i1 = max(int((gy0 - miny) / res), 0), min(int(np.ceil((gy1 - miny) / res)), ny)
+            xs = minx + np.arange(j0, j1 + 1) * res
+            ys = miny + np.arange(i0, i1 + 1) * res
+            shapely.prepare(geom)
+            inside = shapely.contains_xy(geom, *np.meshgrid(xs, ys))
+            corners[i0:i1 + 1, j0:j1 + 1][inside] = k + 1
+
+        # A cell is resolved only when its four corners agree
+        c = corners
+        same = (c[:-1, :-1] == c[1:, :-1]) & (c[:-1, :-1] == c[:-1, 1:]) & (c[:-1, :-1] == c[1:, 1:])
+        grid = np.where(same, c[:-1, :-1], boundary).astype(dtype)
+        del corners, c, same
+
+        # Boundaries that enter and leave a cell between its corners (thin strips,
+        # small polygons): mark every cell under a densified boundary vertex
+        edges = shapely.segmentize(shapely.boundary(gdf.geometry.values), res / 4)
+        xy = shapely.get_coordinates(edges)
+        jj = np.clip(((xy[:, 0] - minx) / res).astype(np.int64), 0, nx - 1)
+        ii = np.clip(((xy[:, 1] - miny) / res).astype(np.int64), 0, ny - 1)
+        grid[ii, jj] = boundary
+
+        attrs = pd.DataFrame({
+            key: gdf[col].to_numpy() if col is not None else np.full(len(gdf), None, dtype=object)
+            for key, col in locator._output_columns().items()
+        })
+
+        npy_path, meta_path, attrs_path = cls._paths(path)
+        os.makedirs(os.path.dirname(os.path.abspath(npy_path)), exist_ok=True)
+        with open(npy_path + ".tmp", "wb") as f:
+            np.save(f, grid)
+        os.replace(npy_path + ".tmp", npy_path)
+        attrs.to_parquet(attrs_path, index=False)
+
+        meta = {
+            "x0": minx, "y0": miny, "resolution_deg": res, "resolution_m": resolution_m,
+            "shape": [ny, nx], "dtype": np.dtype(dtype).name, "polygons": len(gdf),
+            "source": _source_signature(locator.adm3_path),
+            "boundary_share": float((grid == boundary).mean()),
+        }
+        # Written last: a grid without its .json is never opened
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + ".tmp", meta_path)
+        return cls(np.load(npy_path, mmap_mode="r"), meta, attrs)
+
+    def lookup(self, lats, lons) -> np.ndarray:
+        """Raw cell values for the points (0 outside the grid or for NaN coordinates)."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        ny, nx = self.codes.shape
+        i = np.floor((lats - self.y0) / self.res)
+        j = np.floor((lons - self.x0) / self.res)
+        ok = (i >= 0) & (i < ny) & (j >= 0) & (j < nx)
+        values = np.zeros(lats.shape, dtype=self.codes.dtype)
+        values[ok] = self.codes[i[ok].astype(np.int64), j[ok].astype(np.int64)]
+        return values
+
 
 class ThaiAdminLocator:
-    def __init__(self, adm3_path: str):
+    def __init__(self, adm3_path: str, grid_path: str = None, grid_resolution_m: float = 100.0,
+                 cache_path: str = None, use_cache: bool = True):
         if not os.path.exists(adm3_path):
             raise FileNotFoundError(f"ADM3-like shapefile not found at: {adm3_path}")
 
-        self.gdf = gpd.read_file(adm3_path)
+        self.adm3_path = adm3_path
+        # GeoParquet copy (EPSG:4326, resolved columns) that later starts load instead of the shapefile
+        self.cache_path = cache_path or os.path.splitext(adm3_path)[0] + ".cache.parquet"
+        self.use_cache = use_cache
+        self._gdf = None
 
-        # Ensure CRS is WGS84 (EPSG:4326)
-        if self.gdf.crs is None or self.gdf.crs.to_epsg() != 4326:
-            self.gdf = self.gdf.to_crs(epsg=4326)
+        # With a grid, the shapefile is only read for boundary cells (or to build the grid)
+        self.grid = None
+        if grid_path:
+            self.grid = AdminGrid.open(grid_path, adm3_path) or AdminGrid.build(self, grid_path, grid_resolution_m)
 
-        # Store available column names
-        cols = set(self.gdf.columns)
+    @property
+    def gdf(self):
+        if self._gdf is None:
+            self._load_shapefile()
+        return self._gdf
 
-        # Column resolution
-        self.ADM1_TH = self._pick_col(cols, ["ADM1_TH", "PROV_NAM_T", "prov_name_th", "prov_th", "province_th"])
-        self.ADM1_EN = self._pick_col(cols, ["ADM1_EN", "PROV_NAM_E", "prov_name_en", "prov_en", "province_en"])
-        self.ADM2_TH = self._pick_col(cols, ["ADM2_TH", "AMP_NAM_T", "amphoe_th", "dist_name_th", "district_th"])
-        self.ADM2_EN = self._pick_col(cols, ["ADM2_EN", "AMP_NAM_E", "amphoe_en", "dist_name_en", "district_en"])
-        self.ADM3_TH = self._pick_col(cols, ["ADM3_TH", "TAM_NAM_T", "tambon_th", "subdist_th", "subdistrict_th"])
-        self.ADM3_EN = self._pick_col(cols, ["ADM3_EN", "TAM_NAM_E", "tambon_en", "subdist_en", "subdistrict_en"])
+    def _resolve_columns(self, cols: set) -> dict:
+        return {
+            "ADM1_TH": self._pick_col(cols, ["ADM1_TH", "PROV_NAM_T", "prov_name_th", "prov_th", "province_th"]),
+            "ADM1_EN": self._pick_col(cols, ["ADM1_EN", "PROV_NAM_E", "prov_name_en", "prov_en", "province_en"]),
+            "ADM2_TH": self._pick_col(cols, ["ADM2_TH", "AMP_NAM_T", "amphoe_th", "dist_name_th", "district_th"]),
+            "ADM2_EN": self._pick_col(cols, ["ADM2_EN", "AMP_NAM_E", "amphoe_en", "dist_name_en", "district_en"]),
+            "ADM3_TH": self._pick_col(cols, ["ADM3_TH", "TAM_NAM_T", "tambon_th", "subdist_th", "subdistrict_th"]),
+            "ADM3_EN": self._pick_col(cols, ["ADM3_EN", "TAM_NAM_E", "tambon_en", "subdist_en", "subdistrict_en"]),
+            "ADM1_PC": self._pick_col(cols, ["ADM1_PCODE", "prov_code", "prov_id", "P_CODE_1"]),
+            "ADM2_PC": self._pick_col(cols, ["ADM2_PCODE", "amp_code", "amphoe_id", "P_CODE_2"]),
+            "ADM3_PC": self._pick_col(cols, ["ADM3_PCODE", "tam_code", "tambon_id", "P_CODE_3"]),
+        }
 
-        self.ADM1_PC = self._pick_col(cols, ["ADM1_PCODE", "prov_code", "prov_id", "P_CODE_1"])
-        self.ADM2_PC = self._pick_col(cols, ["ADM2_PCODE", "amp_code", "amphoe_id", "P_CODE_2"])
-        self.ADM3_PC = self._pick_col(cols, ["ADM3_PCODE", "tam_code", "tambon_id", "P_CODE_3"])
+    def _read_cache(self):
+        """(gdf, columns) from the GeoParquet cache, or None when it is missing or stale."""
+        meta_path = self.cache_path + ".json"
+        if not os.path.exists(meta_path) or not os.path.exists(self.cache_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
 
-        # Build spatial index
-        _ = self.gdf.sindex
+        signature = _source_signature(self.adm3_path)
+        if meta.get("source") != signature:
+            # Touched or copied: only hash the files when the mtime/size changed
+            if meta.get("sha256") != _shapefile_digest(self.adm3_path):
+                logging.info("Shapefile changed, rebuilding cache %s", self.cache_path)
+                return None
+            meta["source"] = signature
+            self._write_json(meta_path, meta)
+        return gpd.read_parquet(self.cache_path), meta["columns"]
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def _write_cache(self, gdf, columns: dict):
+        try:
+            gdf.to_parquet(self.cache_path + ".tmp", index=False)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+            # Written last: the parquet is only trusted once its metadata exists
+            self._write_json(self.cache_path + ".json", {
+                "source": _source_signature(self.adm3_path),
+                "sha256": _shapefile_digest(self.adm3_path),
+                "columns": columns,
+            })
+        except OSError as e:
+            logging.warning("Could not write shapefile cache %s: %s", self.cache_path, e)
+
+    def _load_shapefile(self):
+        cached = self._read_cache() if self.use_cache else None
+        if cached is not None:
+            gdf, columns = cached
+        else:
+            gdf = gpd.read_file(self.adm3_path)
+
+            # Ensure CRS is WGS84 (EPSG:4326)
+            if gdf.crs is None or gdf.crs.to_epsg() != 4326:
+                gdf = gdf.to_crs(epsg=4326)
+
+            # Column resolution
+            columns = self._resolve_columns(set(gdf.columns))
+            if self.use_cache:
+                self._write_cache(gdf, columns)
+
+        for attr, col in columns.items():
+            setattr(self, attr, col)
+
+        # Build spatial index (an STRtree over the cached WKB takes milliseconds)
+        _ = gdf.sindex
+        self._gdf = gdf
+
+    def _output_columns(self) -> dict:
+        _ = self.gdf  # column names are resolved when the shapefile is loaded
+        return {
+            "province_th": self.ADM1_TH,
+            "province_en": self.ADM1_EN,
+            "district_th": self.ADM2_TH,
+            "district_en": self.ADM2_EN,
+            "subdistrict_th": self.ADM3_TH,
+            "subdistrict_en": self.ADM3_EN,
+            "province_code": self.ADM1_PC,
+            "district_code": self.ADM2_PC,
+            "subdistrict_code": self.ADM3_PC,
+        }
 
     def _pick_col(self, cols, candidates):
         for c in candidates:
@@ -39,6 +264,13 @@ class ThaiAdminLocator:
         return None
 
     def latlon_to_admin(self, lat: float, lon: float, buffer_meters: float = 0.0):
+        if self.grid is not None:
+            code = int(self.grid.lookup([lat], [lon])[0])
+            if 0 < code < self.grid.boundary:
+                return {key: values[code - 1] for key, values in self.grid.attrs.items()}
+            if code == 0 and buffer_meters <= 0:
+                return None
+
         pt = Point(lon, lat)  # (x=lon, y=lat)
 
         # Fast candidate filter via spatial index
@@ -53,29 +285,89 @@ class ThaiAdminLocator:
         match = cand[cand.contains(pt)]
 
         if match.empty and buffer_meters > 0:
-            deg = buffer_meters / 111_000.0
+            deg = buffer_meters / METERS_PER_DEGREE
             match = cand[cand.intersects(pt.buffer(deg))]
 
         if match.empty:
             return None
 
         row = match.iloc[0]
-        return {
-            "province_th": row.get(self.ADM1_TH),
-            "province_en": row.get(self.ADM1_EN),
-            "district_th": row.get(self.ADM2_TH),
-            "district_en": row.get(self.ADM2_EN),
-            "subdistrict_th": row.get(self.ADM3_TH),
-            "subdistrict_en": row.get(self.ADM3_EN),
-            "province_code": row.get(self.ADM1_PC),
-            "district_code": row.get(self.ADM2_PC),
-            "subdistrict_code": row.get(self.ADM3_PC),
-        }
-        
+        return {key: row.get(col) for key, col in self._output_columns().items()}
+
+    @staticmethod
+    def _first_match(query_idx, tree_idx, n):
+        """Lowest polygon position per query point, -1 where there is none."""
+        first = np.full(n, -1, dtype=np.int64)
+        order = np.lexsort((tree_idx, query_idx))
+        q, t = query_idx[order], tree_idx[order]
+        pts, starts = np.unique(q, return_index=True)
+        first[pts] = t[starts]
+        return first
+
+    def _polygon_positions(self, lats, lons, buffer_meters: float) -> np.ndarray:
+        points = shapely.points(lons, lats)  # (x=lon, y=lat)
+        n = len(points)
+
+        # "within" is the point-side view of polygon.contains(point)
+        q, t = self.gdf.sindex.query(points, predicate="within")
+        poly = self._first_match(q, t, n)
+
+        misses = np.flatnonzero(poly < 0)
+        if buffer_meters > 0 and len(misses):
+            deg = buffer_meters / METERS_PER_DEGREE
+            q, t = self.gdf.sindex.query(shapely.buffer(points[misses], deg), predicate="intersects")
+            poly[misses] = self._first_match(q, t, len(misses))
+        return poly
+
+    def latlon_to_admin_bulk(self, lats, lons, buffer_meters: float = 0.0) -> pd.DataFrame:
+        """
+        latlon_to_admin for many points at once, as a DataFrame aligned to the input
+        (all-None rows where nothing matched).
+
+        All points go through one STRtree query; points left unmatched are
+        retried with the buffer_meters circle against every nearby polygon
+        (latlon_to_admin only retries polygons whose bbox holds the point).
+        With a grid, only points in boundary cells (and, with a buffer, points
+        outside every polygon) take that path.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n = len(lats)
+
+        poly = np.full(n, -1, dtype=np.int64)
+        exact = np.ones(n, dtype=bool)
+        if self.grid is not None:
+            codes = self.grid.lookup(lats, lons).astype(np.int64)
+            resolved = (codes > 0) & (codes < self.grid.boundary)
+            poly[resolved] = codes[resolved] - 1
+            exact = (codes == self.grid.boundary) | ((codes == 0) & (buffer_meters > 0))
+        if exact.any():
+            poly[exact] = self._polygon_positions(lats[exact], lons[exact], buffer_meters)
+
+        found = poly >= 0
+        if self.grid is not None:
+            columns = self.grid.attrs
+        else:
+            columns = {key: self.gdf[col].to_numpy(dtype=object) if col is not None else None
+                       for key, col in self._output_columns().items()}
+        result = {}
+        for key, source in columns.items():
+            values = np.full(n, None, dtype=object)
+            if source is not None:
+                values[found] = source[poly[found]]
+            result[key] = values
+        return pd.DataFrame(result)
+
+
 if __name__ == "__main__":
     adm3_path = "/Volumes/PortableSSD/Hydroneo/gis-Thai/thailand_gis/tambon/thailand_province_amphoe_tambon_simplify/thailand_province_amphoe_tambon_simplify.shp"
-    locator = ThaiAdminLocator(adm3_path)
+    # ~100 m lookup grid next to the shapefile; built on first use, then just mmapped
+    grid_path = os.path.splitext(adm3_path)[0] + "_grid100m"
+    locator = ThaiAdminLocator(adm3_path, grid_path=grid_path)
 
     # Example: Lat/Lon in Bangkok
     result = locator.latlon_to_admin(13.7563, 100.5018, buffer_meters=10)
     print(result)
+
+    # Many points at once
+    print(locator.latlon_to_admin_bulk([13.7563, 18.7883], [100.5018, 98.9853], buffer_meters=10))